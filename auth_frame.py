@@ -36,37 +36,39 @@ class AuthFrame(tk.Frame):
 
     def init_widgets(self):
         """
-        Initializes or rebuilds the authentication form UI depending on the current mode (login or registration).
-        Clears all existing widgets and redraws them.
+        Creates the authentication form widgets once.
+        Mode switches and logout only reconfigure and repack them.
         """
-        for widget in self.winfo_children():
-            widget.destroy()
-
         self.title_label = tk.Label(self, text="Entrance", font=("Arial", 16))
-        self.title_label.pack(pady=10)
-
         self.login_entry = tk.Entry(self)
         self.login_entry.insert(0, "Login")
-        self.login_entry.pack(pady=5)
 
         self.username_entry = tk.Entry(self)
-        if not self.is_login_mode:
-            self.username_entry.insert(0, "Display Name")
-            self.username_entry.pack(pady=5)
+        self.username_entry.insert(0, "Display Name")
 
         self.password_entry = tk.Entry(self, show="*")
         self.password_entry.insert(0, "1234")
-        self.password_entry.pack(pady=5)
 
         self.auth_button = tk.Button(self, text="Enter", command=self.authenticate)
-        self.auth_button.pack(pady=10)
-
         self.switch_button = tk.Button(self, text="No account? Register", command=self.switch_mode)
-        self.switch_button.pack(pady=5)
 
         self.logout_button = tk.Button(self, text="Exit", command=self.logout)
         self.success_label = tk.Label(self, text="", font=("Arial", 12))
 
+        self.show_form()
+
+    def show_form(self):
+        """
+        Packs the authentication form for the current mode (login or registration).
+        """
+        self.title_label.pack(pady=10)
+        self.login_entry.pack(pady=5)
+        if not self.is_login_mode:
+            self.username_entry.pack(pady=5)
+        self.password_entry.pack(pady=5)
+        self.auth_button.pack(pady=10)
+        self.switch_button.pack(pady=5)
+
     def switch_mode(self):
         """
         Toggles between login and registration modes.
@@ -79,7 +81,10 @@ class AuthFrame(tk.Frame):
         self.title_label.config(text=mode)
         self.auth_button.config(text="Enter" if self.is_login_mode else "Register")
         self.switch_button.config(text=button_text)
-        self.init_widgets()
+        if self.is_login_mode:
+            self.username_entry.pack_forget()
+        else:
+            self.username_entry.pack(pady=5, before=self.password_entry)
 
     def authenticate(self):
         """
@@ -89,7 +94,7 @@ class AuthFrame(tk.Frame):
         - In registration mode: creates a new account and switches to log in.
         """
         login = self.login_entry.get()
-        password = str(self.password_entry.get())
+        password = self.password_entry.get()
         username = self.username_entry.get().strip() if not self.is_login_mode else None
 
         if self.is_login_mode:
@@ -143,4 +148,7 @@ class AuthFrame(tk.Frame):
         self.username = None
         self.login_entry.delete(0, tk.END)
         self.password_entry.delete(0, tk.END)
-        self.init_widgets()
+
+        self.success_label.pack_forget()
+        self.logout_button.pack_forget()
+        self.show_form()
@@ -1,11 +1,35 @@
 import tkinter as tk
 from tkinter import messagebox, ttk
-from typing import cast, Literal
-from PIL import Image, ImageTk
-from datetime import datetime
+from PIL import ImageTk
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from gallery_frame import load_thumbnail, open_cached_thumbnail, gallery_cache_dir, get_cached_thumb, put_cached_thumb
+from client import NotFound
+from disk_cache import DiskLRU
+import difflib
 import os
-import time
 import threading
+import time
+
+CHAT_WINDOW_SIZE = 50
+IMAGE_RETRY_DELAYS_MS = (50, 100, 200, 400)
+IMAGE_EXTENSIONS = frozenset({".png", ".jpg", ".jpeg"})
+CHATS_CACHE_DIR = "temp_chats_cache"
+
+
+def chats_cache_dir(user_id, chat_id):
+    """
+    Returns the local cache folder of a chat's images as seen by a user.
+    The folders are per user, so a user's chat images can be dropped on logout.
+    """
+    return os.path.join(CHATS_CACHE_DIR, str(user_id), str(chat_id))
+
+
+def _now_stamp():
+    """
+    Returns the current local time in the message timestamp format.
+    """
+    return time.strftime("%Y-%m-%d %H:%M:%S")
 
 
 class ChatFrame(tk.Frame):
@@ -15,6 +39,9 @@ class ChatFrame(tk.Frame):
     - Chat area with history and message input
     - Image preview and upload from gallery
     """
+    _SELF_STYLE = {"anchor": "e", "justify": "right", "fg": "#0047AB", "bg": "#D0E6FF"}
+    _OTHER_STYLE = {"anchor": "w", "justify": "left", "fg": "#4B4B4B", "bg": "#F0F0F0"}
+
     def __init__(self, parent, client, username, user_id):
         """
         Initializes the chat interface UI and member variables.
@@ -30,9 +57,27 @@ class ChatFrame(tk.Frame):
         self.client = client
 
         self.selected_chat_id = None
-        self.chats = [{}]
+        self.chats = []
         self._chat_id_map = {}
+        self._displayed_chats = []
         self._friend_id_map = {}
+        self._bubble_cache = {}
+        self._current_chat_widgets = []
+        self._bubble_pool_self = []
+        self._bubble_pool_other = []
+        self._chat_messages = []
+        self._packed_range = (0, 0)
+        self._window_update_pending = False
+        self._scroll_pending = False
+        self._scroll_bottom_pending = False
+        self._loading_chats = False
+        self._thumb_pool = ThreadPoolExecutor(max_workers=4)
+        self._download_pool = ThreadPoolExecutor(max_workers=2)
+        self._net_pool = ThreadPoolExecutor(max_workers=2)  # Requests that only read, their order does not matter
+        # Messages go out one at a time, so the server stores them in the order they were sent
+        self._send_pool = ThreadPoolExecutor(max_workers=1)
+        self._inflight_downloads = {}
+        self._ensured_cache_dirs = set()
 
         self.sidebar = None
         self.search_entry = None
@@ -94,15 +139,14 @@ class ChatFrame(tk.Frame):
 
         self.chat_canvas = tk.Canvas(chat_area_frame, bg="white", borderwidth=0)
         self.chat_scrollbar = tk.Scrollbar(chat_area_frame, orient="vertical", command=self.chat_canvas.yview)
-        self.chat_canvas.configure(yscrollcommand=self.chat_scrollbar.set)
+        self.chat_canvas.configure(yscrollcommand=self._on_chat_view_changed)
 
         self.chat_scrollbar.pack(side="right", fill="y")
         self.chat_canvas.pack(side="right", fill="both", expand=True)
 
         self.chat_area = tk.Frame(self.chat_canvas, bg="white")
         self.chat_canvas.create_window((0, 0), window=self.chat_area, anchor="nw")
-        self.chat_area.bind("<Configure>",
-                            lambda e: self.chat_canvas.configure(scrollregion=self.chat_canvas.bbox("all")))
+        self.chat_area.bind("<Configure>", self._on_area_configure)
 
         input_frame = tk.Frame(right_frame, bg="white")
         input_frame.pack(side="bottom", fill="x")
@@ -116,32 +160,155 @@ class ChatFrame(tk.Frame):
         attach_button = tk.Button(input_frame, text="📎", command=self.open_gallery_selector_for_chat)
         attach_button.pack(side="left", padx=5)
 
-    def load_chats(self):
-        """Fetches available chats from the server and displays them in the sidebar."""
-        self.chats = self.client.get_chats()
+    def attach(self, username, user_id):
+        """
+        Binds the frame to a newly logged-in user. The widgets are kept,
+        the chat list is fetched again by load_chats.
+
+        :param username: Current user's name
+        :param user_id: Current user's ID
+        """
+        self.username = username
+        self.user_id = user_id
+
+    def detach(self):
+        """
+        Clears everything shown for the logged-out user and drops the references to it.
+        Results of requests still running for that user are discarded.
+        """
+        self._ensure_packed(0, 0)
+        for bubbles in self._bubble_cache.values():
+            for bubble in bubbles:
+                if bubble is not None:
+                    bubble.destroy()
+        self._bubble_cache = {}
+        self._current_chat_widgets = []
+        self._chat_messages = []
+
         self.chat_listbox.delete(0, tk.END)
-        for chat in self.chats:
-            self.chat_listbox.insert(tk.END, chat["name"])
+        self.message_entry.delete(0, tk.END)
+        for label in self.friends_frame.winfo_children():
+            label.destroy()
+
+        self.selected_chat_id = None
+        self.chats = []
+        self._chat_id_map = {}
+        self._displayed_chats = []
+        self._friend_id_map = {}
+        self._loading_chats = False
+        # The user's cache folders are dropped on logout
+        self._inflight_downloads = {}
+        self._ensured_cache_dirs = set()
+        self.username = None
+        self.user_id = None
+
+    def _run_async(self, func, *args, callback=None, owner=None):
+        """
+        Runs a blocking client call on the network pool, so the UI is not frozen
+        for the round-trip, and hands its result to callback on the Tk thread.
+        The callback is skipped if the owner window was closed or the user logged out in the meantime.
+
+        :param func: Client method to call
+        :param args: Positional arguments for func
+        :param callback: Called with the result, or None if the call failed
+        :param owner: Widget the result is rendered into (defaults to this frame)
+        """
+        future = self._net_pool.submit(func, *args)
+        if callback is not None:
+            user_id = self.user_id
+            future.add_done_callback(
+                lambda f: self.after(0, self._deliver_result, f, callback, owner or self, user_id))
+
+    def _send_message(self, chat_id, message_type, content):
+        """
+        Sends a message on the single send worker, after all messages sent before it.
+
+        :param chat_id: ID of the chat
+        :param message_type: "text" or "image"
+        :param content: Message text or server-side image path
+        """
+        self._send_pool.submit(self.client.send_message, chat_id, message_type, content)
+
+    def _deliver_result(self, future, callback, owner, user_id):
+        """
+        Passes the result of a finished network call to its callback (on the Tk thread).
+        """
+        if not owner.winfo_exists() or user_id != self.user_id:
+            return
+
+        try:
+            result = future.result()
+        except Exception as e:
+            print(f"Request error: {e}")
+            result = None
+        callback(result)
+
+    def load_chats(self):
+        """
+        Fetches available chats from the server and displays them in the sidebar.
+        Calls while a fetch is still running are ignored, so repeated tab switches don't stack requests.
+        """
+        if self._loading_chats:
+            return
+        self._loading_chats = True
+        self._run_async(self.client.get_chats, callback=self._on_chats_loaded)
+
+    def _on_chats_loaded(self, chats):
+        """
+        Ends the running load_chats and applies its result.
+
+        :param chats: List of chat dicts, or None if the request failed
+        """
+        self._loading_chats = False
+        self._apply_chats(chats)
+
+    def _apply_chats(self, chats):
+        """
+        Stores the fetched chats and updates the sidebar list.
+
+        :param chats: List of chat dicts, or None if the request failed
+        """
+        if chats is None:
+            return
+        self.chats = chats
+        self._update_chat_listbox()
 
     def load_friends(self):
-        """Fetches the current user's friends and their online status, and displays them."""
-        for widget in self.friends_frame.winfo_children():
-            widget.destroy()
+        """Fetches the current user's friends and their online status in the background."""
+        self._run_async(self.client.get_friends, callback=self._render_friends)
+
+    def _render_friends(self, friends):
+        """
+        Displays the fetched friends in the sidebar.
+        Existing labels are reconfigured in place and only the difference in count is
+        created or destroyed. The panel is unpacked meanwhile, so the sidebar is laid out only once.
+
+        :param friends: List of friend dicts, or None if the request failed
+        """
+        self.friends_frame.pack_forget()
 
         try:
-            friends = self.client.get_friends()
+            rows = []
+            for friend in friends:
+                online = friend["online"]
+                status_icon = "🟢" if online else "🔴"
+                status_color = "#00AA00" if online else "#AA0000"
+                rows.append((f"{status_icon} {friend['friend_name']}", status_color))
         except Exception:
-            tk.Label(self.friends_frame, text="Download error", bg="#f0f0f0", fg="red").pack(anchor="w")
-            return
+            rows = [("Download error", "red")]
+
+        labels = self.friends_frame.winfo_children()
+        for label in labels[len(rows):]:
+            label.destroy()
 
-        for friend in friends:
-            name = friend["friend_name"]
-            online = friend["online"]
-            status_icon = "🟢" if online else "🔴"
-            status_color = "#00AA00" if online else "#AA0000"
-            label = tk.Label(self.friends_frame, text=f"{status_icon} {name}", anchor="w", fg=status_color,
-                             bg="#f0f0f0", font=("Arial", 9))
-            label.pack(fill="x", anchor="w")
+        for index, (text, color) in enumerate(rows):
+            if index < len(labels):
+                labels[index].configure(text=text, fg=color)
+            else:
+                label = tk.Label(self.friends_frame, text=text, anchor="w", fg=color, bg="#f0f0f0", font=("Arial", 9))
+                label.pack(fill="x", anchor="w")
+
+        self.friends_frame.pack(fill="x", padx=10, before=self.refresh_friends_button)
 
     def on_chat_select(self, event):
         """Handles chat selection from the listbox and displays its message history."""
@@ -149,24 +316,174 @@ class ChatFrame(tk.Frame):
         if not selection:
             return
 
-        index = selection[0]
-        chat = self.chats[index]
-        self.selected_chat_id = chat["id"]
-        self.display_chat_history(self.selected_chat_id)
+        chat_id = self._chat_id_map.get(selection[0])
+        if chat_id is None:
+            return
+
+        self.selected_chat_id = chat_id
+        self.display_chat_history(chat_id)
 
     def display_chat_history(self, chat_id):
-        """Loads and displays all stored messages for the given chat."""
-        for widget in self.chat_area.winfo_children():
-            widget.destroy()
+        """
+        Displays the stored messages for the given chat.
+        Only the last CHAT_WINDOW_SIZE bubbles are packed, older ones are packed
+        on demand when the user scrolls up. Bubbles are built once per chat and
+        reused on later switches.
+        """
+        self._ensure_packed(0, 0)
 
-        chat_history = self.client.load_chat_history(chat_id)
-        for message in chat_history:
-            self.display_message(message)
+        self._chat_messages = self.client.load_chat_history(chat_id)
+        bubbles = self._bubble_cache.setdefault(chat_id, [])
+        for bubble in bubbles[len(self._chat_messages):]:
+            if bubble is not None:
+                bubble.destroy()
+        del bubbles[len(self._chat_messages):]
+        bubbles.extend([None] * (len(self._chat_messages) - len(bubbles)))
+        self._current_chat_widgets = bubbles
+
+        self._show_last_messages()
 
     def display_message(self, message):
         """
-        Displays a single message bubble (text or image) in the chat area.
+        Appends a single message bubble to the currently displayed chat
+        and scrolls the chat area to the bottom.
+        """
+        self._chat_messages.append(message)
+        self._current_chat_widgets.append(self._build_bubble(message))
+        self._show_last_messages()
+
+    def _show_last_messages(self):
+        """Packs the bubbles of the newest messages and scrolls the chat area to the bottom."""
+        total = len(self._current_chat_widgets)
+        self._ensure_packed(max(0, total - CHAT_WINDOW_SIZE), total)
+        self._scroll_to_bottom()
+
+    def _scroll_to_bottom(self):
+        """
+        Schedules scrolling the chat area to the bottom once the pending layout is done.
+        Several appends or image loads in a row result in a single layout flush.
+        """
+        if self._scroll_bottom_pending:
+            return
+        self._scroll_bottom_pending = True
+        self.chat_canvas.after_idle(self._apply_scroll_to_bottom)
+
+    def _apply_scroll_to_bottom(self):
+        """Lays out the chat area and scrolls it to the bottom."""
+        self._scroll_bottom_pending = False
+        self.chat_canvas.update_idletasks()
+        self.chat_canvas.yview_moveto(1.0)
+
+    def _bubble_at(self, index):
+        """
+        Returns the bubble of the message at the given index of the current chat,
+        building it on first use.
+        """
+        bubble = self._current_chat_widgets[index]
+        if bubble is None:
+            bubble = self._build_bubble(self._chat_messages[index])
+            self._current_chat_widgets[index] = bubble
+        return bubble
+
+    def _ensure_packed(self, lo, hi):
+        """
+        Makes exactly the bubbles in range [lo, hi) of the current chat packed.
+        Only bubbles at the edges of the previously packed range are packed or forgotten.
+        Forgotten text bubbles are returned to their pool and rebuilt from it on demand.
+
+        :param lo: Index of the first bubble to show
+        :param hi: Index after the last bubble to show
+        """
+        old_lo, old_hi = self._packed_range
+        for i in range(old_lo, old_hi):
+            if not lo <= i < hi:
+                bubble = self._current_chat_widgets[i]
+                bubble.pack_forget()
+                if bubble.pool is not None:
+                    bubble.pool.append(bubble)
+                    self._current_chat_widgets[i] = None
+
+        keep_lo, keep_hi = max(lo, old_lo), min(hi, old_hi)
+        if keep_lo < keep_hi:
+            first_kept = self._current_chat_widgets[keep_lo]
+            for i in range(lo, keep_lo):
+                self._bubble_at(i).pack(fill="x", padx=10, pady=2, before=first_kept)
+            appended = range(keep_hi, hi)
+        else:
+            appended = range(lo, hi)
+
+        for i in appended:
+            self._bubble_at(i).pack(fill="x", padx=10, pady=2)
+
+        self._packed_range = (lo, hi)
+
+    def _on_area_configure(self, event):
+        """
+        Schedules a scrollregion update when the chat area changes size.
+        Packing many bubbles in a row results in a single bbox computation.
+        """
+        if self._scroll_pending:
+            return
+        self._scroll_pending = True
+        self.chat_canvas.after_idle(self._apply_scrollregion)
+
+    def _apply_scrollregion(self):
+        """Resizes the chat canvas scrollregion to its contents."""
+        self._scroll_pending = False
+        self.chat_canvas.configure(scrollregion=self.chat_canvas.bbox("all"))
+
+    def _on_chat_view_changed(self, first, last):
+        """
+        Called by the chat canvas whenever its visible region changes.
+        Updates the scrollbar and schedules shifting of the packed bubble window.
+        """
+        self.chat_scrollbar.set(first, last)
+        if self._window_update_pending:
+            return
+        lo, hi = self._packed_range
+        if (float(first) <= 0.0 and lo > 0) or (float(last) >= 1.0 and hi < len(self._current_chat_widgets)):
+            self._window_update_pending = True
+            self.after_idle(self._shift_packed_window)
+
+    def _shift_packed_window(self):
+        """
+        Moves the packed bubble window by half its size towards the scrolled edge,
+        keeping the currently visible messages in place.
+        """
+        self._window_update_pending = False
+        first, last = self.chat_canvas.yview()
+        lo, hi = self._packed_range
+        total = len(self._current_chat_widgets)
+        step = CHAT_WINDOW_SIZE // 2
+
+        if first <= 0.0 and lo > 0:
+            new_lo = max(0, lo - step)
+            new_hi = min(hi, new_lo + CHAT_WINDOW_SIZE)
+        elif last >= 1.0 and hi < total:
+            new_hi = min(total, hi + step)
+            new_lo = max(lo, new_hi - CHAT_WINDOW_SIZE)
+        else:
+            return
+
+        anchor_bubble = self._current_chat_widgets[max(lo, new_lo)]
+        anchor_y = anchor_bubble.winfo_y()
+        top = first * self.chat_area.winfo_height()
+
+        self._ensure_packed(new_lo, new_hi)
+        self.chat_area.update_idletasks()
+        self.chat_canvas.configure(scrollregion=self.chat_canvas.bbox("all"))
+
+        height = self.chat_area.winfo_height()
+        if height > 0:
+            self.chat_canvas.yview_moveto((top + anchor_bubble.winfo_y() - anchor_y) / height)
+
+    def _build_bubble(self, message):
+        """
+        Builds a single message bubble (text or image) without packing it.
         Downloads the image from server if necessary.
+
+        :param message: Dict with message info
+        :return: Container frame of the bubble
         """
         sender = message.get("sender", "Unknown")
         sender_id = message.get("sender_id", "")
@@ -175,65 +492,158 @@ class ChatFrame(tk.Frame):
         message_type = message.get("message_type", "text")
 
         is_self = sender_id == self.user_id
-        anchor: Literal["e", "w"] = cast(Literal["e", "w"], "e" if is_self else "w")
-        text_align: Literal["left", "right"] = cast(Literal["left", "right"], "right" if is_self else "left")
+        if message_type == "text":
+            bubble = self._acquire_text_bubble(is_self)
+            bubble.sender_label.configure(text=f"{sender}, {timestamp}")
+            bubble.text_label.configure(text=content)
+            return bubble
+
+        style = self._SELF_STYLE if is_self else self._OTHER_STYLE
+        anchor = style["anchor"]
+        container = self._new_bubble_frame(style)
+        container.sender_label.configure(text=f"{sender}, {timestamp}")
+
+        if message_type == "image":
+            cache_dir = chats_cache_dir(self.user_id, message.get("chat_id", ""))
+            if cache_dir not in self._ensured_cache_dirs:
+                os.makedirs(cache_dir, exist_ok=True)
+                self._ensured_cache_dirs.add(cache_dir)
+            temp_file_path = os.path.join(cache_dir, os.path.basename(content))
+
+            photo = get_cached_thumb(temp_file_path, (300, 300))
+            if photo is None:
+                photo = open_cached_thumbnail(temp_file_path, (300, 300))
+                if photo is not None:
+                    put_cached_thumb(temp_file_path, (300, 300), photo)
+            if photo is not None:
+                self._place_bubble_image(container, anchor, photo)
+            else:
+                self._load_bubble_image(container, anchor, content, temp_file_path)
+
+        return container
+
+    def _new_bubble_frame(self, style):
+        """
+        Creates an empty bubble container with its sender label.
+
+        :param style: _SELF_STYLE or _OTHER_STYLE
+        :return: Container frame, the label is available as its sender_label attribute
+            and the pool it is returned to when unpacked as pool (None unless it is a text bubble)
+        """
         container = tk.Frame(self.chat_area, bg="white")
-        container.pack(anchor=anchor, fill="x", padx=10, pady=2)
+        container.pool = None
+        container.sender_label = tk.Label(container, font=("Arial", 8, "italic"), fg=style["fg"], bg="white",
+                                          anchor=style["anchor"])
+        container.sender_label.pack(anchor=style["anchor"], padx=5)
+        return container
 
-        name_color = "#0047AB" if is_self else "#4B4B4B"
-        bubble_color = "#D0E6FF" if is_self else "#F0F0F0"
+    def _acquire_text_bubble(self, is_self):
+        """
+        Takes a text bubble of the right style from its pool, creating one if the pool is empty.
+        Pooled bubbles keep all their style options, so reusing one only needs its texts set.
 
-        sender_label = tk.Label(container, text=f"{sender}, {timestamp}", font=("Arial", 8, "italic"), fg=name_color,
-                                bg="white", anchor=anchor)
-        sender_label.pack(anchor=anchor, padx=5)
+        :param is_self: Whether the bubble shows a message of the current user
+        :return: Container frame with sender_label and text_label attributes
+        """
+        pool = self._bubble_pool_self if is_self else self._bubble_pool_other
+        if pool:
+            return pool.pop()
+
+        style = self._SELF_STYLE if is_self else self._OTHER_STYLE
+        container = self._new_bubble_frame(style)
+        container.text_label = tk.Label(container, font=("Arial", 11), bg=style["bg"], wraplength=400,
+                                        justify=style["justify"], padx=10, pady=5, bd=1, relief="solid")
+        container.text_label.pack(anchor=style["anchor"], padx=10)
+        container.pool = pool
+        return container
+
+    def _load_bubble_image(self, container, anchor, content, temp_file_path, attempt=0):
+        """
+        Schedules download and decoding of a chat image in the download pool.
+        Bubbles showing the same image share one in-flight download.
+        The result is handed back to the Tk thread by _on_bubble_image_loaded.
+
+        :param container: Bubble frame to put the image into
+        :param anchor: Side of the chat area the bubble is aligned to
+        :param content: Server-side image path
+        :param temp_file_path: Local cache path of the image
+        :param attempt: Number of attempts already made
+        """
+        future = self._inflight_downloads.get(content)
+        if future is None:
+            future = self._download_pool.submit(self._fetch_bubble_image, content, temp_file_path)
+            self._inflight_downloads[content] = future
+        future.add_done_callback(
+            lambda f: self.chat_canvas.after(0, self._on_bubble_image_loaded, f, container, anchor, content,
+                                             temp_file_path, attempt))
+
+    def _fetch_bubble_image(self, content, temp_file_path):
+        """
+        Downloads the image into the local cache if needed and decodes its thumbnail.
+        Runs in the download pool, so it must not touch any Tk objects.
 
-        if message_type == "text":
-            bubble = tk.Label(container, text=content, font=("Arial", 11), bg=bubble_color if is_self else "#F0F0F0",
-                              wraplength=400, justify=text_align, padx=10, pady=5, bd=1, relief="solid")
-            bubble.pack(anchor=anchor, padx=10)
-        elif message_type == "image":
-            cache_dir = os.path.join("temp_chats_cache", str(message.get("chat_id", "")))
-            os.makedirs(cache_dir, exist_ok=True)
-            temp_file_path = os.path.join(cache_dir, os.path.basename(content))
+        :return: Thumbnail as PIL image, or None if the server returned no data
+        """
+        if not os.path.exists(temp_file_path):
+            image_data = self.client.download(content)
+            if not image_data:
+                return None
+            # Written under a temporary name, so a crash or a concurrent download never leaves a partial file
+            partial_path = f"{temp_file_path}.part{threading.get_ident()}"
+            Path(partial_path).write_bytes(image_data)
+            os.replace(partial_path, temp_file_path)
+        else:
+            DiskLRU.touch(temp_file_path)
+
+        return load_thumbnail(temp_file_path, (300, 300))
+
+    def _on_bubble_image_loaded(self, future, container, anchor, content, temp_file_path, attempt):
+        """
+        Puts a loaded image into its bubble (on the Tk thread).
+        Failed attempts are retried with growing Tk timer delays; files missing on the server are not retried.
+        """
+        if self._inflight_downloads.get(content) is future:
+            del self._inflight_downloads[content]
 
-            def try_load_image():
-                for _ in range(5):
-                    try:
-                        if not os.path.exists(temp_file_path):
-                            image_data = self.client.download(content)
-                            if not image_data:
-                                time.sleep(0.5)
-                                continue
-                            with open(temp_file_path, "wb") as f:
-                                f.write(image_data)
-
-                        img = Image.open(temp_file_path)
-                        img.thumbnail((300, 300))
-                        photo = ImageTk.PhotoImage(img)
-
-                        def on_ui_thread():
-                            image_label = tk.Label(container, image=photo, bg="white")
-                            image_label.image = photo
-                            image_label.pack(anchor=anchor, padx=10)
-                            self.chat_canvas.update_idletasks()
-                            self.chat_canvas.yview_moveto(1.0)
-
-                        self.chat_canvas.after(0, on_ui_thread)
-                        return
-                    except Exception as e:
-                        print(f"Retrying image download: {e}")
-                        time.sleep(0.5)
-
-                def on_fail():
-                    tk.Label(container, text="[Couldn't load image]", fg="red", bg="white").pack(anchor=anchor)
-                    self.chat_canvas.update_idletasks()
-                    self.chat_canvas.yview_moveto(1.0)
-                self.chat_canvas.after(0, on_fail)
-            threading.Thread(target=try_load_image, daemon=True).start()
+        if not container.winfo_exists():
             return
 
-        self.chat_canvas.update_idletasks()
-        self.chat_canvas.yview_moveto(1.0)
+        retry = attempt < len(IMAGE_RETRY_DELAYS_MS)
+        try:
+            img = future.result()
+        except NotFound:
+            img = None
+            retry = False
+        except Exception as e:
+            print(f"Retrying image download: {e}")
+            img = None
+
+        if img is None:
+            if retry:
+                self.chat_canvas.after(IMAGE_RETRY_DELAYS_MS[attempt], self._load_bubble_image, container, anchor,
+                                       content, temp_file_path, attempt + 1)
+            else:
+                tk.Label(container, text="[Couldn't load image]", fg="red", bg="white").pack(anchor=anchor)
+                self._scroll_to_bottom()
+            return
+
+        photo = ImageTk.PhotoImage(img)
+        put_cached_thumb(temp_file_path, (300, 300), photo)
+        self._place_bubble_image(container, anchor, photo)
+        self._scroll_to_bottom()
+
+    @staticmethod
+    def _place_bubble_image(container, anchor, photo):
+        """
+        Shows an image thumbnail inside a message bubble.
+
+        :param container: Bubble frame to put the image into
+        :param anchor: Side of the chat area the bubble is aligned to
+        :param photo: PhotoImage thumbnail
+        """
+        image_label = tk.Label(container, image=photo, bg="white")
+        image_label.image = photo
+        image_label.pack(anchor=anchor, padx=10)
 
     def open_create_chat_window(self):
         """
@@ -252,12 +662,12 @@ class ChatFrame(tk.Frame):
         friends_box = tk.Listbox(window, selectmode="multiple", width=30, height=10)
         friends_box.pack(pady=(0, 10))
 
-        friends = self.client.get_friends()
-        for index, friend in enumerate(friends):
-            name = friend["friend_name"]
-            fid = friend["friend_id"]
-            self._friend_id_map[index] = fid
-            friends_box.insert(tk.END, name)
+        def show_friends(friends):
+            friends = friends or []
+            self._friend_id_map = {index: friend["friend_id"] for index, friend in enumerate(friends)}
+            friends_box.insert(tk.END, *[friend["friend_name"] for friend in friends])
+
+        self._run_async(self.client.get_friends, callback=show_friends, owner=window)
 
         def create_chat():
             chat_name = chat_name_entry.get().strip()
@@ -271,7 +681,10 @@ class ChatFrame(tk.Frame):
                 return
 
             selected_ids = [self._friend_id_map[i] for i in selected_indices]
-            chat_id = self.client.create_new_chat(chat_name, selected_ids)
+            self._run_async(self.client.create_new_chat, chat_name, selected_ids,
+                            callback=lambda chat_id: chat_created(chat_name, chat_id), owner=window)
+
+        def chat_created(chat_name, chat_id):
             if chat_id is not None:
                 messagebox.showinfo("Success", f"Chat '{chat_name}' created!")
                 window.destroy()
@@ -300,21 +713,23 @@ class ChatFrame(tk.Frame):
 
         result_list = tk.Listbox(window)
         result_list.pack(padx=10, pady=5, fill="both", expand=True)
-        users = [{}]
+        users = []
 
         def search_user():
             query = search_entry.get().strip()
             if not query:
                 messagebox.showwarning("Error", "Enter the search query.")
                 return
-            result_list.delete(0, tk.END)
+            self._run_async(self.client.search_user, query, self.user_id, callback=show_results, owner=window)
+
+        def show_results(found):
             nonlocal users
-            users = self.client.search_user(query, self.user_id)
+            users = found or []
+            result_list.delete(0, tk.END)
             if not users:
                 result_list.insert(tk.END, "No users found")
                 return
-            for user in users:
-                result_list.insert(tk.END, f"{user['username']} (ID: {user['id']})")
+            result_list.insert(tk.END, *[f"{user['username']} (ID: {user['id']})" for user in users])
 
         def send_request():
             selection = result_list.curselection()
@@ -326,8 +741,10 @@ class ChatFrame(tk.Frame):
                 return
 
             selected_user = users[index]
-            to_id = selected_user["id"]
-            success = self.client.send_friend_request(to_id)
+            self._run_async(self.client.send_friend_request, selected_user["id"],
+                            callback=lambda success: request_sent(selected_user, success), owner=window)
+
+        def request_sent(selected_user, success):
             if success:
                 messagebox.showinfo("Success", f"The request has been sent to the user '{selected_user['username']}'")
                 window.destroy()
@@ -363,28 +780,34 @@ class ChatFrame(tk.Frame):
         outgoing_list = tk.Listbox(outgoing_frame)
         outgoing_list.pack(padx=10, pady=10, fill="both", expand=True)
 
-        incoming_users = [{}]
-        outgoing_users = [{}]
+        incoming_users = []
+        outgoing_users = []
 
         def refresh_lists():
-            nonlocal incoming_users, outgoing_users
-            incoming_users = self.client.get_incoming_requests()
-            outgoing_users = self.client.get_outgoing_requests()
+            self._run_async(self.client.get_incoming_requests, callback=show_incoming, owner=window)
+            self._run_async(self.client.get_outgoing_requests, callback=show_outgoing, owner=window)
 
+        def show_incoming(users):
+            nonlocal incoming_users
+            incoming_users = users or []
             incoming_list.delete(0, tk.END)
-            for user in incoming_users:
-                incoming_list.insert(tk.END, f"{user['username']} (ID: {user['id']})")
+            incoming_list.insert(tk.END, *[f"{user['username']} (ID: {user['id']})" for user in incoming_users])
 
+        def show_outgoing(users):
+            nonlocal outgoing_users
+            outgoing_users = users or []
             outgoing_list.delete(0, tk.END)
-            for user in outgoing_users:
-                outgoing_list.insert(tk.END, f"{user['username']} (ID: {user['id']})")
+            outgoing_list.insert(tk.END, *[f"{user['username']} (ID: {user['id']})" for user in outgoing_users])
 
         def accept_selected():
             selection = incoming_list.curselection()
             if not selection:
                 return
             user = incoming_users[selection[0]]
-            success = self.client.accept_friend_request(user["id"])
+            self._run_async(self.client.accept_friend_request, user["id"],
+                            callback=lambda success: accepted(user, success), owner=window)
+
+        def accepted(user, success):
             if success:
                 messagebox.showinfo("Success", f"You are now friends with {user['username']}")
             else:
@@ -396,7 +819,10 @@ class ChatFrame(tk.Frame):
             if not selection:
                 return
             user = incoming_users[selection[0]]
-            success = self.client.decline_friend_request(user["id"])
+            self._run_async(self.client.decline_friend_request, user["id"],
+                            callback=lambda success: declined(user, success), owner=window)
+
+        def declined(user, success):
             if success:
                 messagebox.showinfo("Declined", f"Request from {user['username']} declined.")
             else:
@@ -411,12 +837,28 @@ class ChatFrame(tk.Frame):
 
     def refresh_chat_list(self):
         """Reloads chat list and maps indexes to chat IDs."""
-        self.chat_listbox.delete(0, tk.END)
-        self.chats = self.client.get_chats()
+        self._run_async(self.client.get_chats, callback=self._apply_chats)
+
+    def _update_chat_listbox(self):
+        """
+        Brings the sidebar chat list and the index to chat ID map in line with self.chats.
+        Only rows of added, removed or renamed chats are touched, so the selection
+        and scroll position of unchanged rows are kept.
+        """
+        self._chat_id_map = {index: chat["id"] for index, chat in enumerate(self.chats)}
+        rows = [(chat["id"], chat["name"]) for chat in self.chats]
+        matcher = difflib.SequenceMatcher(None, self._displayed_chats, rows, autojunk=False)
+
+        # Walk the changes backwards so indexes of earlier rows stay valid
+        for tag, i1, i2, j1, j2 in reversed(matcher.get_opcodes()):
+            if tag == "equal":
+                continue
+            if i2 > i1:
+                self.chat_listbox.delete(i1, i2 - 1)
+            if j2 > j1:
+                self.chat_listbox.insert(i1, *[name for _, name in rows[j1:j2]])
 
-        for index, chat in enumerate(self.chats):
-            self._chat_id_map[index] = chat["id"]
-            self.chat_listbox.insert(tk.END, chat["name"])
+        self._displayed_chats = rows
 
     def send_text_message(self):
         """
@@ -427,22 +869,24 @@ class ChatFrame(tk.Frame):
         if not content or not self.selected_chat_id:
             return
 
-        self.client.send_message(self.selected_chat_id, "text", content)
+        self._send_message(self.selected_chat_id, "text", content)
         self.message_entry.delete(0, tk.END)
         self.display_message({"sender": self.username, "sender_id": self.user_id, "message_type": "text",
-                              "content": content, "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S")})
+                              "content": content, "timestamp": _now_stamp()})
 
     def open_gallery_selector_for_chat(self):
         """
         Opens a gallery image picker window that shows all cached images.
         User can click on any image to send it to the currently selected chat.
         """
-        cache_dir = "temp_gallery_cache"
+        cache_dir = gallery_cache_dir(self.user_id)
         if not os.path.exists(cache_dir):
             messagebox.showinfo("The gallery is empty", "There are no images in the gallery cache.")
             return
 
-        image_files = [f for f in os.listdir(cache_dir) if f.lower().endswith(('.png', '.jpg', '.jpeg'))]
+        with os.scandir(cache_dir) as entries:
+            image_files = [entry for entry in entries
+                           if entry.is_file() and os.path.splitext(entry.name)[1].lower() in IMAGE_EXTENSIONS]
         if not image_files:
             messagebox.showinfo("The gallery is empty", "There are no images in the gallery cache.")
             return
@@ -462,48 +906,83 @@ class ChatFrame(tk.Frame):
         canvas.pack(side="left", fill="both", expand=True)
         scrollbar.pack(side="right", fill="y")
 
-        for i, filename in enumerate(image_files):
-            image_path = os.path.join(cache_dir, filename)
+        for i, entry in enumerate(image_files):
+            filename = entry.name
+            image_path = entry.path
             server_path = f"uploads/{self.user_id}/{filename}"
-            self.display_gallery_thumbnail(scrollable_frame, i, filename, image_path, server_path, selector)
 
-    def display_gallery_thumbnail(self, parent, index, filename, image_path, server_path, selector_window):
+            thumbnail = get_cached_thumb(image_path, (150, 150))
+            if thumbnail is None:
+                thumbnail = open_cached_thumbnail(image_path, (150, 150))
+                if thumbnail is not None:
+                    put_cached_thumb(image_path, (150, 150), thumbnail)
+            if thumbnail is not None:
+                self._place_thumb(scrollable_frame, i, filename, thumbnail, server_path, selector)
+                continue
+
+            future = self._thumb_pool.submit(self._decode_thumb, image_path)
+            future.add_done_callback(
+                lambda f, index=i, name=filename, local=image_path, path=server_path:
+                self.after(0, self._on_thumb_decoded, f, scrollable_frame, index, name, local, path, selector))
+
+    @staticmethod
+    def _decode_thumb(image_path):
+        """
+        Decodes and downsizes a gallery image for the selector.
+        Runs in the thumbnail worker pool, so it must not touch any Tk objects.
+
+        :param image_path: Local cached path
+        :return: Thumbnail as PIL image
+        """
+        return load_thumbnail(image_path, (150, 150))
+
+    def _on_thumb_decoded(self, future, parent, index, filename, image_path, server_path, selector_window):
+        """
+        Converts a thumbnail decoded by the worker pool into a cached PhotoImage
+        and places it in the gallery selector (on the Tk thread).
         """
-        Helper function to render a single image thumbnail inside the gallery selector.
+        if not selector_window.winfo_exists():
+            return
+
+        try:
+            thumbnail = ImageTk.PhotoImage(future.result())
+        except Exception as e:
+            print(f"Error loading the preview: {e}")
+            return
+
+        put_cached_thumb(image_path, (150, 150), thumbnail)
+        self._place_thumb(parent, index, filename, thumbnail, server_path, selector_window)
+
+    def _place_thumb(self, parent, index, filename, thumbnail, server_path, selector_window):
+        """
+        Renders a single thumbnail inside the gallery selector.
         Binds click event to send the image to the chat.
 
         :param parent: Parent frame to insert the thumbnail
         :param index: Position in the grid
         :param filename: Display name
-        :param image_path: Local cached path
+        :param thumbnail: PhotoImage thumbnail
         :param server_path: Server-side image path to send
         :param selector_window: Reference to close the selector after sending
         """
-        try:
-            image = Image.open(image_path)
-            image.thumbnail((150, 150))
-            thumbnail = ImageTk.PhotoImage(image)
-
-            frame = ttk.Frame(parent)
-            frame.grid(row=index // 4, column=index % 4, padx=10, pady=10)
-
-            label = tk.Label(frame, image=thumbnail)
-            label.image = thumbnail
-            label.pack()
-
-            def send_to_chat(event):
-                if not self.selected_chat_id:
-                    messagebox.showwarning("Error", "Select a chat.")
-                    return
-                self.client.send_message(self.selected_chat_id, "image", server_path)
-                self.display_message({"chat_id": self.selected_chat_id, "sender": self.username,
-                                      "sender_id": self.user_id, "message_type": "image", "content": server_path,
-                                      "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S")})
-                selector_window.destroy()
-
-            label.bind("<Button-1>", send_to_chat)
-
-            caption = tk.Label(frame, text=filename, wraplength=120)
-            caption.pack()
-        except Exception as e:
-            print(f"Error loading the preview: {e}")
+        frame = ttk.Frame(parent)
+        frame.grid(row=index // 4, column=index % 4, padx=10, pady=10)
+
+        label = tk.Label(frame, image=thumbnail)
+        label.image = thumbnail
+        label.pack()
+
+        def send_to_chat(event):
+            if not self.selected_chat_id:
+                messagebox.showwarning("Error", "Select a chat.")
+                return
+            self._send_message(self.selected_chat_id, "image", server_path)
+            self.display_message({"chat_id": self.selected_chat_id, "sender": self.username,
+                                  "sender_id": self.user_id, "message_type": "image", "content": server_path,
+                                  "timestamp": _now_stamp()})
+            selector_window.destroy()
+
+        label.bind("<Button-1>", send_to_chat)
+
+        caption = tk.Label(frame, text=filename, wraplength=120)
+        caption.pack()
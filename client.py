@@ -1,12 +1,71 @@
 import socket
 import json
+import logging
 import ssl
 import threading
 import os
 import queue
+from collections import deque
+from concurrent.futures import Future
 from datetime import datetime
+from urllib.parse import quote, urlencode
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 CRT_FILE = "cert.pem"
+CHAT_HISTORY_DIR = "chat_history"
+HISTORY_BATCH_SIZE = 64
+RECV_BUFFER_SIZE = 65536
+RECEIVE_JOIN_TIMEOUT = 0.5
+INLINE_BODY_LIMIT = 65536
+SOCKET_BUFFER_SIZE = 1024 * 1024
+
+log = logging.getLogger(__name__)
+
+
+def json_dumps(obj):
+    """
+    Serializes an object to JSON bytes, using orjson when it is installed.
+
+    :param obj: Object to serialize
+    :return: UTF-8 encoded JSON
+    """
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj).encode()
+
+
+def json_loads(data):
+    """
+    Parses JSON from bytes or str, using orjson when it is installed.
+
+    :param data: JSON document
+    :return: Parsed object
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def resolve_server(host, port):
+    """
+    Looks up the IPv4 socket address of the server.
+
+    :param host: Host name or IP address of the server
+    :param port: Port to connect to
+    :return: (ip, port) tuple that can be passed to socket.connect
+    """
+    return socket.getaddrinfo(host, port, socket.AF_INET, socket.SOCK_STREAM)[0][4]
+
+
+class NotFound(Exception):
+    """
+    Raised when the server reports that a requested file does not exist,
+    so callers can give up instead of retrying.
+    """
 
 
 class Client:
@@ -15,17 +74,29 @@ class Client:
     Handles sending and receiving HTTP-like requests over sockets,
     manages session state, chat logic, and user interaction.
     """
-    def __init__(self, server_ip, server_port):
+    def __init__(self, server_ip, server_port, addr=None):
         """
-        Initializes the SSL connection to the server and starts the receiving thread.
+        Initializes the client. The SSL connection to the server is opened in the background,
+        where the receiving thread is started once it is up.
 
         :param server_ip: IP address of the server
         :param server_port: Port to connect to
+        :param addr: Socket address already resolved by resolve_server, looked up by the first connect if omitted
         """
         self.server_ip = server_ip
         self.server_port = server_port
-        self.response_queue = queue.Queue()
+        # Resolved once, reconnects go straight to the address
+        self.server_addr = addr
+        self.pending_responses = deque()
+        self.request_lock = threading.Lock()
+        self.recv_buffer = bytearray()
+        self.recv_chunk = memoryview(bytearray(RECV_BUFFER_SIZE))
+        self.chat_histories = {}
+        self.history_lock = threading.Lock()
+        self.history_queue = queue.Queue()
+        threading.Thread(target=self._history_writer_loop, daemon=True).start()
         self.chat_frame = None
+        self.on_incoming_message = None  # Called with every pushed chat message, from the receiving thread
         self.user_id = None
         self.user_login = None
         self.username = None
@@ -34,9 +105,63 @@ class Client:
         if CRT_FILE:
             self.ssl_context.load_verify_locations(CRT_FILE)
 
+        self.raw_socket = None
+        self.client_socket = None
+        self.receive_thread = None
+        self.connected = False
+        self.closed = False
+        threading.Thread(target=self._connect_in_background, daemon=True).start()
+
+    def _connect_in_background(self):
+        """
+        Opens the first connection without holding up the creation of the client.
+        Requests sent meanwhile wait for it on the request lock.
+        If it fails, the next request tries to connect again.
+        """
+        with self.request_lock:
+            if self.connected or self.closed:
+                return
+            try:
+                self.connect()
+            except OSError as e:
+                log.warning("Error connecting to the server: %s", e)
+                return
+        # close() ran while the handshake was in progress
+        if self.closed:
+            self.close()
+
+    def connect(self):
+        """
+        Opens the SSL connection to the server and starts receiving on it.
+        Called in the background on creation, and again by send_request if the server closed the connection.
+        The server address is looked up by the first call and reused after that. A reconnect offers the TLS session of the previous connection, so the server can resume it
+        instead of doing a full handshake.
+        """
+        if self.server_addr is None:
+            self.server_addr = resolve_server(self.server_ip, self.server_port)
+
+        session = None
+        if self.client_socket is not None:
+            try:
+                session = self.client_socket.session
+            except (OSError, ValueError):
+                session = None
+            self.client_socket.close()
+
         self.raw_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.client_socket = self.ssl_context.wrap_socket(self.raw_socket, server_hostname=self.server_ip)
-        self.client_socket.connect((self.server_ip, self.server_port))
+        # Requests are written in one go, so Nagle's algorithm would only delay small ones
+        self.raw_socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        # The connection idles between requests, keepalive notices when the server went away
+        self.raw_socket.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        if hasattr(socket, "TCP_QUICKACK"):
+            self.raw_socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_QUICKACK, 1)
+        self.raw_socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, SOCKET_BUFFER_SIZE)
+        self.raw_socket.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, SOCKET_BUFFER_SIZE)
+        self.client_socket = self.ssl_context.wrap_socket(self.raw_socket, server_hostname=self.server_ip,
+                                                          session=session)
+        self.client_socket.connect(self.server_addr)
+        self.recv_buffer.clear()
+        self.connected = True
         self.start_receiving()
 
     def set_chat_frame(self, chat_frame):
@@ -53,72 +178,134 @@ class Client:
         :param method: HTTP method ("GET", "POST")
         :param path: URL path (e.g., "/login")
         :param params: Optional URL query parameters as a dictionary
-        :param body: Optional binary payload
+        :param body: Optional binary payload (bytes-like)
         :return: Server response (status_code, body)
         """
-        params_str = '&'.join(f'{key}={value}' for key, value in (params or {}).items())
-        url = f'{path}?{params_str}' if params_str else path
-
-        headers = {"Content-Length": str(len(body)) if body else "0"}
-
-        request = f"{method} {url} HTTP/1.1\r\n"
-        request += "\r\n".join(f"{key}: {value}" for key, value in headers.items())
-        request += "\r\n\r\n"
-
-        if body:
-            request = request.encode() + body
-        else:
-            request = request.encode()
-
-        self.client_socket.sendall(request)
-        return self.response_queue.get()
+        # Values are percent-encoded so names with spaces or "&" survive, slashes in paths stay readable
+        url = f"{path}?{urlencode(params, safe='/', quote_via=quote)}" if params else path
+
+        head = f"{method} {url} HTTP/1.1\r\nContent-Length: {len(body) if body else 0}\r\n\r\n".encode()
+
+        # The server answers requests in the order they arrive, so each response resolves
+        # the oldest pending future. Requests from several threads can be in flight at once;
+        # the lock only keeps a request's bytes and its place in the queue together.
+        future = Future()
+        with self.request_lock:
+            if not self.connected:
+                if self.closed:
+                    raise ConnectionError("The client has been closed")
+                self.connect()
+            self.pending_responses.append(future)
+            try:
+                if body and len(body) > INLINE_BODY_LIMIT:
+                    # Large payloads (uploads) follow the head directly instead of being copied into one request
+                    self.client_socket.sendall(head)
+                    self.client_socket.sendall(body)
+                else:
+                    self.client_socket.sendall(head + body if body else head)
+            except Exception:
+                self.pending_responses.remove(future)
+                raise
+        return future.result()
 
     def start_receiving(self):
         """
         Starts a background thread to listen for incoming server messages.
         """
-        threading.Thread(target=self._receive_loop, daemon=True).start()
+        self.receive_thread = threading.Thread(target=self._receive_loop, daemon=True)
+        self.receive_thread.start()
 
     def _receive_loop(self):
+        """
+        Receives server responses until the connection ends.
+        Requests still waiting for a response then fail instead of blocking forever.
+        """
+        try:
+            self._receive_responses()
+        finally:
+            # Under the request lock, so a request reconnecting in the meantime keeps its future
+            with self.request_lock:
+                self.connected = False
+                while self.pending_responses:
+                    self.pending_responses.popleft().set_exception(ConnectionError("Connection to the server closed"))
+
+    def _receive_responses(self):
         """
         Continuously listens for server responses.
-        Parses headers and dispatches messages or enqueues regular responses.
+        Parses headers and dispatches messages or resolves pending requests.
         """
+        buffer = self.recv_buffer
         while True:
             try:
-                data = b""
-                while b"\r\n\r\n" not in data:
-                    chunk = self.client_socket.recv(1024)
-                    if not chunk:
+                header_end = buffer.find(b"\r\n\r\n")
+                while header_end == -1:
+                    if not self._receive_chunk():
+                        return
+                    header_end = buffer.find(b"\r\n\r\n")
+
+                # Only the status and two headers are needed, so they are looked up on the raw bytes
+                headers = bytes(buffer[:header_end]).lower()
+                try:
+                    # The server always starts with "HTTP/1.1 XYZ", so the code sits at a fixed offset
+                    status = int(headers[9:12])
+                except ValueError:
+                    status = int(headers.split(b" ", 2)[1])
+                content_length = int(self._header_value(headers, b"content-length") or 0)
+                is_message = b"\r\ntype:" in headers and self._header_value(headers, b"type") == b"message"
+                body_start = header_end + 4
+                body_end = body_start + content_length
+
+                # The body is received straight into a buffer of its final size;
+                # bytes past this response already belong to the next one and stay buffered
+                body = bytearray(content_length)
+                view = memoryview(body)
+                received = min(len(buffer), body_end) - body_start
+                view[:received] = buffer[body_start:body_start + received]
+                del buffer[:body_start + received]
+                while received < content_length:
+                    count = self.client_socket.recv_into(view[received:], content_length - received)
+                    if not count:
                         return
-                    data += chunk
-
-                headers, _, body = data.partition(b"\r\n\r\n")
-                headers = headers.decode().split("\r\n")
-                status_line = headers[0]
-
-                headers_dict = {}
-                for header in headers[1:]:
-                    key, value = header.split(": ", 1)
-                    headers_dict[key.lower()] = value
-
-                content_length = int(headers_dict.get("content-length", 0))
-                while len(body) < content_length:
-                    body += self.client_socket.recv(1024)
-
-                status = int(status_line.split(" ")[1])
-                type_header = headers_dict.get("type", "response")
-                if status == 200 or status == 201:
-                    if type_header == "message":
-                        self.handle_incoming_message(body)
-                    else:
-                        self.response_queue.put((status, body))
+                    received += count
+
+                if (status == 200 or status == 201) and is_message:
+                    self.handle_incoming_message(body)
+                elif self.pending_responses:
+                    self.pending_responses.popleft().set_result((status, body))
                 else:
-                    self.response_queue.put((status, body))
+                    print("Unexpected response from the server:", status)
             except Exception as e:
                 print("Receive error:", e)
                 break
 
+    @staticmethod
+    def _header_value(headers, name):
+        """
+        Finds a header in a lowercased raw header block.
+
+        :param headers: Header bytes (status line included), lowercased
+        :param name: Lowercase header name
+        :return: Stripped header value as bytes, or None if the header is missing
+        """
+        start = headers.find(b"\r\n" + name + b":")
+        if start == -1:
+            return None
+        start += len(name) + 3
+        end = headers.find(b"\r\n", start)
+        return headers[start:end if end != -1 else len(headers)].strip()
+
+    def _receive_chunk(self):
+        """
+        Reads up to RECV_BUFFER_SIZE bytes from the socket into the receive buffer.
+
+        :return: False if the connection was closed, True otherwise
+        """
+        received = self.client_socket.recv_into(self.recv_chunk)
+        if not received:
+            return False
+        self.recv_buffer += self.recv_chunk[:received]
+        return True
+
     def handle_incoming_message(self, body):
         """
         Handles real-time incoming chat messages from the server.
@@ -126,52 +313,95 @@ class Client:
         :param body: Raw JSON message payload
         """
         try:
-            message = json.loads(body)
+            message = json_loads(body)
             chat_id = message.get("chat_id")
             if chat_id:
                 self.save_message(chat_id, message)
+                if self.on_incoming_message is not None:
+                    self.on_incoming_message(message)
                 sender = message.get("sender")
                 content = message.get("content")
                 print(f"\n[Chat {chat_id}] Message from {sender}: {content}")
-                if hasattr(self, "chat_frame") and self.chat_frame.selected_chat_id == chat_id:
+                if self.chat_frame is not None and self.chat_frame.selected_chat_id == chat_id:
                     self.chat_frame.display_message(message)
         except Exception as e:
             print("Error handling incoming message:", e)
 
-    @staticmethod
-    def save_message(chat_id, message_data):
+    def _chat_history(self, chat_id):
         """
-        Saves a message to a local JSON file for the given chat.
+        Returns the in-memory history of a chat, reading it from disk on first use.
+        Messages saved by older versions in chat_<id>.json come first, followed by chat_<id>.jsonl.
+        Must be called with history_lock held.
+
+        :param chat_id: ID of the chat
+        :return: List of message dictionaries
+        """
+        key = str(chat_id)
+        history = self.chat_histories.get(key)
+        if history is None:
+            history = []
+            legacy_path = os.path.join(CHAT_HISTORY_DIR, f"chat_{key}.json")
+            if os.path.exists(legacy_path):
+                with open(legacy_path, "rb") as f:
+                    history.extend(json_loads(f.read()))
+
+            file_path = os.path.join(CHAT_HISTORY_DIR, f"chat_{key}.jsonl")
+            if os.path.exists(file_path):
+                with open(file_path, "rb") as f:
+                    history.extend(json_loads(line) for line in f if line.strip())
+            self.chat_histories[key] = history
+        return history
+
+    def save_message(self, chat_id, message_data):
+        """
+        Saves a message to the local history of the given chat.
+        The message is appended as one JSON line instead of rewriting the whole file.
 
         :param chat_id: ID of the chat
         :param message_data: Dict with message info
         """
-        os.makedirs("chat_history", exist_ok=True)
-        file_path = os.path.join("chat_history", f"chat_{chat_id}.json")
+        with self.history_lock:
+            self._chat_history(chat_id).append(message_data)
+        self.history_queue.put((str(chat_id), message_data))
 
-        if os.path.exists(file_path):
-            with open(file_path, "r", encoding="utf-8") as f:
-                chat_history = json.load(f)
-        else:
-            chat_history = []
+    def _history_writer_loop(self):
+        """
+        Appends saved messages to the chat history files in a background thread,
+        so the receive loop never waits for the disk.
+        Messages queued meanwhile are written together, with one file open per chat.
+        """
+        while True:
+            batch = [self.history_queue.get()]
+            while len(batch) < HISTORY_BATCH_SIZE:
+                try:
+                    batch.append(self.history_queue.get_nowait())
+                except queue.Empty:
+                    break
 
-        chat_history.append(message_data)
-        with open(file_path, "w", encoding="utf-8") as f:
-            json.dump(chat_history, f, indent=2)
+            lines = {}
+            for chat_id, message_data in batch:
+                lines.setdefault(chat_id, []).append(json_dumps(message_data) + b"\n")
 
-    @staticmethod
-    def load_chat_history(chat_id):
+            try:
+                os.makedirs(CHAT_HISTORY_DIR, exist_ok=True)
+                for chat_id, chat_lines in lines.items():
+                    with open(os.path.join(CHAT_HISTORY_DIR, f"chat_{chat_id}.jsonl"), "ab") as f:
+                        f.write(b"".join(chat_lines))
+            except OSError as e:
+                print("Error saving chat history:", e)
+            finally:
+                for _ in batch:
+                    self.history_queue.task_done()
+
+    def load_chat_history(self, chat_id):
         """
-        Loads a saved chat history from local JSON storage.
+        Loads a saved chat history from local storage.
 
         :param chat_id: ID of the chat
-        :return: List of message dictionaries
+        :return: List of message dictionaries (a copy the caller may modify)
         """
-        file_path = os.path.join("chat_history", f"chat_{chat_id}.json")
-        if os.path.exists(file_path):
-            with open(file_path, "r", encoding="utf-8") as f:
-                return json.load(f)
-        return []
+        with self.history_lock:
+            return list(self._chat_history(chat_id))
 
     # POST
     def login(self, login, password):
@@ -181,10 +411,10 @@ class Client:
 
         :return: username on success, None on failure
         """
-        body = (json.dumps({"login": login, "password": password})).encode()
+        body = json_dumps({"login": login, "password": password})
         status, response = self.send_request("POST", "/login", body=body)
 
-        response_data = json.loads(response)
+        response_data = json_loads(response)
         if status == 200:
             self.user_id = response_data.get("id")
             self.user_login = login
@@ -200,10 +430,10 @@ class Client:
         Registers a new user with the server.
         On success, sets session information.
         """
-        body = (json.dumps({"login": login, "username": username, "password": password})).encode()
+        body = json_dumps({"login": login, "username": username, "password": password})
         status, response = self.send_request("POST", "/sign_in", body=body)
 
-        response_data = json.loads(response)
+        response_data = json_loads(response)
         if status == 201:
             self.user_id = response_data.get("id")
             self.user_login = login
@@ -216,12 +446,14 @@ class Client:
         """
         Uploads a file to the server associated with the current user.
 
+        :param filename: Name to store the file under
+        :param file_data: File contents as bytes or any bytes-like object (e.g. a memoryview)
         :return: File path on success, None otherwise
         """
         params = {"filename": filename, "id": self.user_id}
         status, response = self.send_request("POST", "/upload", params, file_data)
 
-        response_data = json.loads(response)
+        response_data = json_loads(response)
         if status == 200:
             print(response_data.get("message"))
             return f"uploads/{self.user_id}/{filename}"
@@ -239,10 +471,10 @@ class Client:
         if self.user_id not in members:
             members.append(self.user_id)
 
-        body = json.dumps({"chat_name": chat_name, "creator_id": self.user_id, "members": members}).encode()
+        body = json_dumps({"chat_name": chat_name, "creator_id": self.user_id, "members": members})
         status, response = self.send_request("POST", "/create_chat", body=body)
 
-        response_data = json.loads(response)
+        response_data = json_loads(response)
         if status == 201:
             print(f"{response_data.get('message')}\r\nChat ID: {response_data.get('chat_id')}")
             return response_data.get("chat_id")
@@ -261,10 +493,10 @@ class Client:
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         message_data = {"chat_id": chat_id, "sender": self.username, "sender_id": self.user_id,
                         "message_type": message_type, "content": content, "timestamp": timestamp}
-        body = json.dumps(message_data).encode()
+        body = json_dumps(message_data)
         status, response = self.send_request("POST", "/send_message", body=body)
 
-        response_data = json.loads(response)
+        response_data = json_loads(response)
         if status == 200:
             print(response_data.get('message'))
             self.save_message(chat_id, message_data)
@@ -275,10 +507,10 @@ class Client:
         """
         Adds a user to an existing chat.
         """
-        body = json.dumps({"chat_id": chat_id, "user_id": user_id_to_add}).encode()
+        body = json_dumps({"chat_id": chat_id, "user_id": user_id_to_add})
         status, response = self.send_request("POST", "/add_to_chat", body=body)
 
-        response_data = json.loads(response)
+        response_data = json_loads(response)
         if status == 200:
             print(f"User {user_id_to_add} added to chat {chat_id} successfully!")
         else:
@@ -290,10 +522,10 @@ class Client:
 
         :return: True on success, False otherwise
         """
-        body = json.dumps({"user_id": self.user_id, "friend_id": friend_id}).encode()
+        body = json_dumps({"user_id": self.user_id, "friend_id": friend_id})
         status, response = self.send_request("POST", "/add_friend", body=body)
 
-        response_data = json.loads(response)
+        response_data = json_loads(response)
         if status == 200:
             print(response_data.get("message"))
             return True
@@ -307,10 +539,10 @@ class Client:
 
         :return: True on success, False otherwise
         """
-        body = json.dumps({"user_id": self.user_id, "friend_id": friend_id}).encode()
+        body = json_dumps({"user_id": self.user_id, "friend_id": friend_id})
         status, response = self.send_request("POST", "/accept_friend", body=body)
 
-        response_data = json.loads(response)
+        response_data = json_loads(response)
         if status == 200:
             print(response_data.get("message"))
             return True
@@ -324,10 +556,10 @@ class Client:
 
         :return: True on success, False otherwise
         """
-        body = json.dumps({"user_id": self.user_id, "friend_id": friend_id}).encode()
+        body = json_dumps({"user_id": self.user_id, "friend_id": friend_id})
         status, response = self.send_request("POST", "/decline_friend", body=body)
 
-        response_data = json.loads(response)
+        response_data = json_loads(response)
         if status == 200:
             print(response_data.get("message"))
             return True
@@ -339,10 +571,10 @@ class Client:
         """
         Removes a user from friend list.
         """
-        body = json.dumps({"user_id": self.user_id, "friend_id": friend_id}).encode()
+        body = json_dumps({"user_id": self.user_id, "friend_id": friend_id})
         status, response = self.send_request("POST", "/remove_friend", body=body)
 
-        response_data = json.loads(response)
+        response_data = json_loads(response)
         if status == 200:
             print(response_data.get("message"))
         else:
@@ -353,7 +585,8 @@ class Client:
         """
         Downloads a file from the server by path.
 
-        :return: File content as bytes, or None on failure
+        :return: File content as bytes, or None on a transient failure
+        :raises NotFound: If the file does not exist on the server
         """
         params = {"file": file_path}
         status, body = self.send_request("GET", "/download", params)
@@ -362,8 +595,10 @@ class Client:
             print("File downloaded successfully!")
             return body
         else:
-            response_data = json.loads(body)
+            response_data = json_loads(body)
             print("File download failed: ", response_data.get("message"))
+            if status == 404:
+                raise NotFound(file_path)
             return None
 
     def get_gallery(self):
@@ -375,7 +610,7 @@ class Client:
         params = {"id": self.user_id}
         status, response = self.send_request("GET", "/gallery", params)
 
-        response_data = json.loads(response)
+        response_data = json_loads(response)
         if status == 200:
             print("Gallery fetched successfully!")
             return response_data.get("images", [])
@@ -392,7 +627,7 @@ class Client:
         params = {"id": self.user_id}
         status, response = self.send_request("GET", "/chats", params)
 
-        response_data = json.loads(response)
+        response_data = json_loads(response)
         if status == 200:
             print("Chats fetched successfully!")
             return response_data.get("chats", [])
@@ -409,7 +644,7 @@ class Client:
         params = {"user_id": self.user_id}
         status, response = self.send_request("GET", "/friends", params)
 
-        response_data = json.loads(response)
+        response_data = json_loads(response)
         if status == 200:
             return response_data.get("friends", [])
         else:
@@ -425,7 +660,7 @@ class Client:
         params = {"user_id": self.user_id}
         status, response = self.send_request("GET", "/requests_incoming", params)
 
-        response_data = json.loads(response)
+        response_data = json_loads(response)
         if status == 200:
             return response_data.get("incoming", [])
         else:
@@ -441,7 +676,7 @@ class Client:
         params = {"user_id": self.user_id}
         status, response = self.send_request("GET", "/requests_outgoing", params)
 
-        response_data = json.loads(response)
+        response_data = json_loads(response)
         if status == 200:
             return response_data.get("outgoing", [])
         else:
@@ -457,27 +692,57 @@ class Client:
         params = {"username": username, "searcher_id": searcher_id}
         status, response = self.send_request("GET", "/search_user", params)
 
-        response_data = json.loads(response)
+        response_data = json_loads(response)
         if status == 200:
             return response_data.get("results", [])
         else:
             print("Search failed:", response_data.get("message"))
             return []
 
-    def exit(self):
+    def reset_session(self):
         """
-        Sends logout request and closes the connection gracefully.
+        Logs the current user out but keeps the connection open,
+        so the next login does not need a new TCP and TLS handshake.
         """
         params = {"id": self.user_id}
         try:
             status, response = self.send_request("GET", "/exit", params)
-            response_data = json.loads(response)
+            response_data = json_loads(response)
             print(response_data.get("message"))
         except Exception as e:
             print("Error during logout:", e)
         finally:
-            try:
-                self.client_socket.shutdown(socket.SHUT_RDWR)
-            except Exception:
-                pass
-            self.client_socket.close()
+            # Let the writer thread finish appending messages that are still queued
+            self.history_queue.join()
+            with self.history_lock:
+                self.chat_histories.clear()
+            self.chat_frame = None
+            self.user_id = None
+            self.user_login = None
+            self.username = None
+
+    def exit(self):
+        """
+        Sends logout request and closes the connection gracefully.
+        """
+        try:
+            self.reset_session()
+        finally:
+            self.close()
+
+    def close(self):
+        """
+        Closes the connection for good, later requests fail instead of reconnecting.
+        Returns once the receiving thread has stopped (or RECEIVE_JOIN_TIMEOUT passed).
+        """
+        self.closed = True
+        if self.client_socket is None:
+            return
+        try:
+            # Wakes up the receiving thread blocked in recv
+            self.client_socket.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.client_socket.close()
+        if self.receive_thread is not None and self.receive_thread is not threading.current_thread():
+            self.receive_thread.join(RECEIVE_JOIN_TIMEOUT)
@@ -0,0 +1,113 @@
+import logging
+import os
+import shutil
+import threading
+import time
+
+CACHE_MAX_BYTES = 200 * 1024 * 1024
+CACHE_MAX_AGE_DAYS = 30
+CACHE_MAX_FILES = 1000  # Thumbnails count as files of their own
+
+log = logging.getLogger(__name__)
+
+
+class DiskLRU:
+    """
+    Size-capped cache directory whose files are evicted least recently used first.
+    Recency is the file's access time, which touch() sets explicitly because many systems
+    mount with relatime or noatime. Every user's files are kept in a subfolder of their own,
+    see user_dir, so they can be dropped on logout.
+    """
+    def __init__(self, root, max_bytes=CACHE_MAX_BYTES, max_age_days=CACHE_MAX_AGE_DAYS, max_files=CACHE_MAX_FILES):
+        """
+        :param root: Cache directory, created if missing
+        :param max_bytes: Total size the cache is trimmed to by gc
+        :param max_age_days: Files not used for this many days are always evicted by gc
+        :param max_files: Number of files the cache is trimmed to by gc
+        """
+        self.root = root
+        self.max_bytes = max_bytes
+        self.max_age_days = max_age_days
+        self.max_files = max_files
+        os.makedirs(root, exist_ok=True)
+
+    def user_dir(self, user_id):
+        """
+        Returns the folder of the cached files owned by a user.
+        """
+        return os.path.join(self.root, str(user_id))
+
+    def drop_user(self, user_id):
+        """
+        Deletes all cached files owned by a user (on logout).
+        The folder is renamed right away, so nothing of it is found afterwards,
+        and deleted in a background thread.
+
+        :param user_id: ID of the user whose files are dropped
+        """
+        user_dir = self.user_dir(user_id)
+        dropped_dir = f"{user_dir}.dropped{time.time_ns()}"
+        try:
+            os.replace(user_dir, dropped_dir)
+        except FileNotFoundError:
+            return
+        except OSError as e:
+            log.warning("Error dropping the cache of user %s: %s", user_id, e)
+            return
+        threading.Thread(target=shutil.rmtree, args=(dropped_dir,), kwargs={"ignore_errors": True},
+                         daemon=True).start()
+
+    @staticmethod
+    def touch(path):
+        """
+        Marks a cached file as just used. Only the access time changes,
+        the modification time is kept because thumbnails are checked against it.
+
+        :param path: Path of the cached file
+        """
+        try:
+            os.utime(path, (time.time(), os.stat(path).st_mtime))
+        except OSError:
+            pass
+
+    def gc(self):
+        """
+        Deletes files not used for max_age_days, then the least recently used ones
+        until the cache fits into max_bytes and max_files.
+        """
+        # os.scandir reports the entry type with the listing, so directories need no extra stat
+        # (and on Windows neither do files)
+        entries = []
+        directories = [self.root]
+        while directories:
+            try:
+                with os.scandir(directories.pop()) as listing:
+                    for entry in listing:
+                        try:
+                            if entry.is_dir(follow_symlinks=False):
+                                if ".dropped" in entry.name:
+                                    # Left over when the process ended while drop_user was deleting it
+                                    shutil.rmtree(entry.path, ignore_errors=True)
+                                else:
+                                    directories.append(entry.path)
+                            else:
+                                stat = entry.stat(follow_symlinks=False)
+                                entries.append((stat.st_atime, stat.st_size, entry.path))
+                        except OSError:
+                            continue
+            except OSError:
+                continue
+
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        count = len(entries)
+        cutoff = time.time() - self.max_age_days * 24 * 60 * 60
+        for atime, size, path in entries:
+            if atime >= cutoff and total <= self.max_bytes and count <= self.max_files:
+                break
+            try:
+                os.unlink(path)
+                total -= size
+                count -= 1
+            except OSError as e:
+                log.warning("Error evicting %s from the cache: %s", path, e)
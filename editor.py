@@ -1,11 +1,14 @@
 import numpy as np
-from numpy.lib.stride_tricks import as_strided
 from PIL import Image
 from io import BytesIO
 
-RED_CHANNEL = 0
-GREEN_CHANNEL = 1
-BLUE_CHANNEL = 2
+UNDO_LIMIT = 20
+LARGE_IMAGE_PIXELS = 4_000_000
+RESIZE_REDUCING_GAP = 2.0
+FILTER_BAND_ROWS = 16  # Output rows per convolution band, small enough for the band buffers to stay in cache
+RIGHT_ANGLE_TRANSPOSES = {90: Image.Transpose.ROTATE_90,
+                          180: Image.Transpose.ROTATE_180,
+                          270: Image.Transpose.ROTATE_270}
 
 
 class Editor:
@@ -23,6 +26,9 @@ class Editor:
         self.current_image = None
         self.undo_stack = []
         self.redo_stack = []
+        self.compressed_data = None
+        self._pixels_cache = None
+        self._snapshot_cache = None
 
     def load_image(self, path):
         """
@@ -32,7 +38,9 @@ class Editor:
         :return: Loaded image (PIL object)
         """
         self.original_image = Image.open(path).convert("RGB")
-        self.current_image = self.original_image.copy()
+        # PIL operations return new images, so the original can be shared instead of copied
+        self.current_image = self.original_image
+        self.compressed_data = None
         self.undo_stack.clear()
         self.redo_stack.clear()
         return self.current_image
@@ -42,39 +50,96 @@ class Editor:
         Resets the current image to the original loaded version.
         """
         if self.original_image:
-            self.current_image = self.original_image.copy()
+            self.current_image = self.original_image
+            self.compressed_data = None
+
+    @staticmethod
+    def _freeze(image):
+        """
+        Encodes an image into a history snapshot.
+        Lossless PNG with the fastest compression keeps undo exact at a fraction of the raw size.
+
+        :param image: PIL image
+        :return: Encoded image bytes
+        """
+        buffer = BytesIO()
+        image.save(buffer, format="PNG", compress_level=1)
+        return buffer.getvalue()
+
+    @staticmethod
+    def _thaw(data):
+        """
+        Decodes a history snapshot back into an image.
+
+        :param data: Bytes produced by _freeze
+        :return: PIL image
+        """
+        return Image.open(BytesIO(data))
+
+    def _snapshot(self):
+        """
+        Returns the history snapshot of the current image.
+        Images are never modified in place, so a snapshot stays valid for as long as the same
+        image object is current; undo/redo and repeated resets reuse it instead of encoding again.
+
+        :return: Encoded image bytes
+        """
+        if self._snapshot_cache is None or self._snapshot_cache[0] is not self.current_image:
+            self._snapshot_cache = (self.current_image, self._freeze(self.current_image))
+        return self._snapshot_cache[1]
+
+    def _restore(self, data):
+        """
+        Makes a history snapshot the current image.
+
+        :param data: Bytes produced by _freeze
+        """
+        self.current_image = self._thaw(data)
+        self._snapshot_cache = (self.current_image, data)
+        self.compressed_data = None
+
+    def save_state(self):
+        """
+        Pushes the current image onto the undo stack before an editing operation.
+        Clears the redo stack and keeps at most UNDO_LIMIT snapshots.
+        """
+        if not self.current_image:
+            return
+        self.undo_stack.append(self._snapshot())
+        if len(self.undo_stack) > UNDO_LIMIT:
+            del self.undo_stack[0]
+        self.redo_stack.clear()
+        self.compressed_data = None
 
     def undo(self):
         """
         Reverts the last editing operation using undo stack.
         """
         if self.undo_stack:
-            self.redo_stack.append(self.current_image.copy())
-            self.current_image = self.undo_stack.pop()
+            self.redo_stack.append(self._snapshot())
+            self._restore(self.undo_stack.pop())
 
     def redo(self):
         """
         Reapplies the last undone operation using redo stack.
         """
         if self.redo_stack:
-            self.undo_stack.append(self.current_image.copy())
-            self.current_image = self.redo_stack.pop()
+            self.undo_stack.append(self._snapshot())
+            self._restore(self.redo_stack.pop())
 
     def compress_image(self, quality):
         """
         Compresses the current image into JPEG format at given quality.
 
         :param quality: Compression quality (0–100)
-        :return: Compressed image as PIL object
+        :return: Encoded JPEG bytes
         """
         if not self.current_image:
             return None
 
         buffer = BytesIO()
-        self.current_image.save(buffer, format="JPEG", quality=quality, optimize=True)
-        buffer.seek(0)
-        compressed_image = Image.open(buffer)
-        return compressed_image
+        self.current_image.save(buffer, format="JPEG", quality=quality, optimize=True, progressive=True)
+        return buffer.getvalue()
 
     def resize_image(self, target_size):
         """
@@ -100,70 +165,13 @@ class Editor:
             new_width = target_width
             new_height = int(new_width / original_ratio)
 
-        # Convert to NumPy array
-        np_img = np.array(self.current_image)
-        # Resize using bilinear interpolation
-        resized = self.bi_linear_resize(np_img, (new_height, new_width))
-        return Image.fromarray(resized)
-
-    def bi_linear_resize(self, image, new_size):
-        """
-        Resizes an image using bilinear interpolation (manual NumPy implementation).
-
-        :param image: Input image as NumPy array
-        :param new_size: (height, width) for resized image
-        :return: Resized NumPy array
-        """
-        old_h, old_w, channels = image.shape
-        new_h, new_w = new_size
-
-        # Create evenly spaced coordinate grid for new size
-        x = np.linspace(0, old_w - 1, new_w)
-        y = np.linspace(0, old_h - 1, new_h)
-        x_grid, y_grid = np.meshgrid(x, y)
-
-        # Compute integer coordinate pairs surrounding each point
-        x1 = np.floor(x_grid).astype(int)
-        y1 = np.floor(y_grid).astype(int)
-        x2 = np.clip(x1 + 1, 0, old_w - 1)
-        y2 = np.clip(y1 + 1, 0, old_h - 1)
-
-        new_image = np.zeros((new_h, new_w, channels), dtype=np.uint8)
-        x_list = [x1, x2, x_grid]
-        y_list = [y1, y2, y_grid]
+        # Large photos are first shrunk by an integer factor with Image.reduce (box averaging),
+        # so the bilinear pass only has to cover the last factor of up to RESIZE_REDUCING_GAP
+        reducing_gap = RESIZE_REDUCING_GAP if original_width * original_height > LARGE_IMAGE_PIXELS else None
 
-        # Interpolate each channel separately
-        new_image[:, :, RED_CHANNEL] = self.interpolate_channel(x_list, y_list, RED_CHANNEL, image)
-        new_image[:, :, GREEN_CHANNEL] = self.interpolate_channel(x_list, y_list, GREEN_CHANNEL, image)
-        new_image[:, :, BLUE_CHANNEL] = self.interpolate_channel(x_list, y_list, BLUE_CHANNEL, image)
-
-        return new_image
-
-    @staticmethod
-    def interpolate_channel(x_list, y_list, channel, image):
-        """
-        Performs bilinear interpolation for a single channel of the image.
-
-        :param x_list: List of x1, x2, and interpolated x grid
-        :param y_list: List of y1, y2, and interpolated y grid
-        :param channel: Channel index (R=0, G=1, B=2)
-        :param image: Original image array
-        :return: Interpolated 2D array of values for the specified channel
-        """
-        # dx and dy are the distances from the top-left pixel (x1, y1)
-        dx = x_list[2] - x_list[0]
-        dy = y_list[2] - y_list[0]
-
-        # Extract the 4 neighboring pixel values for interpolation
-        q11 = image[y_list[0], x_list[0], channel]
-        q12 = image[y_list[1], x_list[0], channel]
-        q21 = image[y_list[0], x_list[1], channel]
-        q22 = image[y_list[1], x_list[1], channel]
-
-        # Interpolate along x (left-right) then y (top-bottom)
-        r1 = q11 * (1 - dx) + q21 * dx
-        r2 = q12 * (1 - dx) + q22 * dx
-        return np.round(r1 * (1 - dy) + r2 * dy)
+        # Pillow's C resampler
+        return self.current_image.resize((new_width, new_height), Image.Resampling.BILINEAR,
+                                         reducing_gap=reducing_gap)
 
     def crop_to_aspect_ratio(self, ratio_width, ratio_height):
         """
@@ -189,6 +197,7 @@ class Editor:
             offset = (height - new_height) // 2
             box = (0, offset, width, offset + new_height)
 
+        self.save_state()
         self.current_image = img.crop(box)
 
     def crop_rect(self, left, top, right, bottom):
@@ -210,6 +219,7 @@ class Editor:
         bottom = max(0, min(bottom, height))
 
         if right > left and bottom > top:
+            self.save_state()
             self.current_image = self.current_image.crop((left, top, right, bottom))
 
     def rotate_image(self, angle):
@@ -220,41 +230,132 @@ class Editor:
         """
         if not self.current_image:
             return
-        self.current_image = self.current_image.rotate(angle, expand=True)
+        self.save_state()
+        transpose = RIGHT_ANGLE_TRANSPOSES.get(angle % 360)
+        if transpose is not None:
+            # Multiples of 90 degrees are a lossless pixel shuffle, no resampling needed
+            self.current_image = self.current_image.transpose(transpose)
+        else:
+            self.current_image = self.current_image.rotate(angle, resample=Image.Resampling.BILINEAR, expand=True)
+
+    def _pixels(self):
+        """
+        Returns the current image as a uint8 NumPy array.
+        The array produced by the previous filter is reused while it still belongs to the current image,
+        so chained filters skip the PIL to NumPy conversion.
+
+        :return: NumPy array (height, width, channels)
+        """
+        if self._pixels_cache is None or self._pixels_cache[0] is not self.current_image:
+            self._pixels_cache = (self.current_image, np.asarray(self.current_image))
+        return self._pixels_cache[1]
 
-    def apply_kernel(self, kernel):
+    def apply_kernel(self, kernel, flipped=False):
         """
         Applies a convolution kernel to the image (e.g., blur, sharpen, edge-detect).
 
         :param kernel: 2D NumPy array defining the filter
+        :param flipped: True if the kernel is already flipped, which saves flipping it on every call
+        """
+        if not self.current_image:
+            return
+
+        # Flip the kernel (convolution definition), float32 weights keep all arithmetic in float32
+        kernel = np.asarray(kernel, dtype=np.float32)
+        if not flipped:
+            kernel = kernel[::-1, ::-1]
+
+        # A single 1 in the middle leaves every pixel as it is, so there is nothing to convolve
+        kh, kw = kernel.shape
+        if kh % 2 and kw % 2 and np.count_nonzero(kernel) == 1 and kernel[kh // 2, kw // 2] == 1:
+            return
+
+        # Convert the pixels to a NumPy array of float32
+        img = self._pixels().astype(np.float32)
+        h, w = img.shape[:2]  # Get image height and width
+
+        if np.linalg.matrix_rank(kernel) == 1:
+            # A rank 1 kernel is the outer product of a column and a row vector,
+            # so two 1D passes need kh + kw instead of kh * kw multiply-adds per pixel
+            u, s, vt = np.linalg.svd(kernel)
+            scale = np.sqrt(s[0])
+            result = self.convolve_axis(img, vt[0] * scale, axis=1)
+            result = self.convolve_axis(result, u[:, 0] * scale, axis=0)
+        else:
+            pad_h, pad_w = kh // 2, kw // 2  # Padding needed for same output size
+
+            # Pad the image to handle borders (reflect padding)
+            padded = np.pad(img, ((pad_h, pad_h), (pad_w, pad_w), (0, 0)), mode="reflect")  # type: ignore
+
+            # Accumulate one shifted view of the padded image per kernel weight,
+            # so no (h, w, kh, kw, c) window array is ever materialized.
+            # Working in bands of rows keeps the accumulator and scratch buffer cache-resident
+            # across all kernel weights instead of streaming the whole image once per weight
+            result = np.empty_like(img)
+            scratch = np.empty((FILTER_BAND_ROWS,) + img.shape[1:], dtype=np.float32)
+            for top in range(0, h, FILTER_BAND_ROWS):
+                rows = min(FILTER_BAND_ROWS, h - top)
+                band = result[top:top + rows]
+                band.fill(0)
+                band_scratch = scratch[:rows]
+                for i in range(kh):
+                    for j in range(kw):
+                        weight = kernel[i, j]
+                        if weight:
+                            np.multiply(padded[top + i:top + i + rows, j:j + w], weight, out=band_scratch)
+                            band += band_scratch
+
+        self._commit_pixels(result)
+
+    def apply_separable(self, row, col):
+        """
+        Applies a separable filter as a horizontal pass followed by a vertical one.
+
+        :param row: 1D array of (already flipped) weights applied along the rows
+        :param col: 1D array of (already flipped) weights applied along the columns
         """
         if not self.current_image:
             return
 
-        # Convert PIL image to NumPy array of float32
-        img = np.array(self.current_image, dtype=np.float32)
-        # Flip the kernel (convolution definition)
-        kernel = np.flipud(np.fliplr(kernel))
-
-        h, w, c = img.shape  # Get image height, width, and channels
-        kh, kw = kernel.shape  # Kernel dimensions
-        pad_h, pad_w = kh // 2, kw // 2  # Padding needed for same output size
-
-        # Pad the image to handle borders (reflect padding)
-        padded = np.pad(img, ((pad_h, pad_h), (pad_w, pad_w), (0, 0)), mode="reflect")  # type: ignore
-
-        # Create sliding windows over the image using stride tricks
-        shape = (h, w, kh, kw, c)
-        strides = (padded.strides[0],  # Row stride
-                   padded.strides[1],  # Column stride
-                   padded.strides[0],  # Kernel row stride
-                   padded.strides[1],  # Kernel column stride
-                   padded.strides[2])  # Channel stride
-        windows = as_strided(padded, shape=shape, strides=strides)
-
-        # Perform convolution: dot product of image window and kernel for each pixel
-        result = np.tensordot(windows, kernel, axes=([2, 3], [0, 1]))
+        img = self._pixels().astype(np.float32)
+        result = self.convolve_axis(img, np.asarray(row, dtype=np.float32), axis=1)
+        result = self.convolve_axis(result, np.asarray(col, dtype=np.float32), axis=0)
+        self._commit_pixels(result)
+
+    def _commit_pixels(self, result):
+        """
+        Makes a filtered float32 array the current image.
+
+        :param result: Filtered image as float32 NumPy array (height, width, channels)
+        """
         # Clip the values and convert to 8-bit unsigned integers
         result = np.clip(result, 0, 255).astype(np.uint8)
-        # Convert result back to PIL image
+        # Convert result back to PIL image, the array is kept for the next filter
+        self.save_state()
         self.current_image = Image.fromarray(result)
+        self._pixels_cache = (self.current_image, result)
+
+    @staticmethod
+    def convolve_axis(img, weights, axis):
+        """
+        Convolves an image along a single axis with reflect padding at the borders.
+
+        :param img: Image as float32 NumPy array (height, width, channels)
+        :param weights: 1D array of (already flipped) kernel weights
+        :param axis: 0 to filter along the columns (vertically), 1 along the rows (horizontally)
+        :return: Filtered float32 NumPy array of the same shape
+        """
+        size = img.shape[axis]
+        pad = len(weights) // 2
+        pad_width = [(0, 0)] * img.ndim
+        pad_width[axis] = (pad, pad)
+        padded = np.pad(img, pad_width, mode="reflect")  # type: ignore
+
+        result = np.zeros_like(img)
+        scratch = np.empty_like(img)
+        for i, weight in enumerate(weights):
+            if weight:
+                taps = padded[i:i + size] if axis == 0 else padded[:, i:i + size]
+                np.multiply(taps, weight, out=scratch)
+                result += scratch
+        return result
@@ -1,4 +1,6 @@
 import tkinter as tk
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from tkinter import filedialog, messagebox
 from PIL import Image, ImageTk
 from editor import Editor
@@ -11,15 +13,27 @@ RESOLUTIONS = {"360p": (480, 360),
                "720p": (1280, 720),
                "1080p": (1920, 1080),
                "1440p": (2560, 1440)}
-KERNELS = {"Blur": np.array([[1, 1, 1, 1, 1], [1, 1, 1, 1, 1],
-                            [1, 1, 1, 1, 1], [1, 1, 1, 1, 1], [1, 1, 1, 1, 1]], dtype=np.float32) / 25.0,
+REDRAW_DELAY_MS = 16
+INTERACTION_SETTLE_MS = 150
+UPLOAD_JPEG_QUALITY = 92
+PHOTO_BUCKET = 32  # Zoomed photos are allocated in multiples of this many pixels and reused
+PHOTO_POOL_SIZE = 4
+# Contiguous float32, the dtype the convolution works in
+KERNELS = {"Blur": np.ones((5, 5), dtype=np.float32) / 25,
            "Sharpness": np.array([[0, -1, 0], [-1, 5, -1], [0, -1, 0]], dtype=np.float32),
            "Edge detection": np.array([[-1, -1, -1], [-1, 8, -1], [-1, -1, -1]], dtype=np.float32),
            "Emboss": np.array([[-2, -1, 0], [-1, 1, 1], [0, 1, 2]], dtype=np.float32),
            "Outline": np.array([[-1, -1, -1], [-1, 9, -1], [-1, -1, -1]], dtype=np.float32),
-           "Box Blur (3x3)": np.ones((3, 3), dtype=np.float32) / 9.0,
-           "Gaussian Blur": np.array([[1, 2, 1], [2, 4, 2], [1, 2, 1]], dtype=np.float32) / 16.0,
-           "Light Sharpen": np.array([[0, -0.5, 0],[-0.5, 3, -0.5],[0, -0.5, 0]], dtype=np.float32)}
+           "Box Blur (3x3)": np.ones((3, 3), dtype=np.float32) / 9,
+           "Gaussian Blur": np.array([[1, 2, 1], [2, 4, 2], [1, 2, 1]], dtype=np.float32) / 16,
+           "Light Sharpen": np.array([[0, -0.5, 0], [-0.5, 3, -0.5], [0, -0.5, 0]], dtype=np.float32)}
+# Flipped once at import into the order the convolution reads them
+FLIPPED_KERNELS = {name: np.ascontiguousarray(kernel[::-1, ::-1]) for name, kernel in KERNELS.items()}
+# Blur kernels that are the outer product of a column and a row vector: name -> (row, col)
+SEPARABLE_KERNELS = {"Blur": (np.full(5, 1 / 5, dtype=np.float32), np.full(5, 1 / 5, dtype=np.float32)),
+                     "Box Blur (3x3)": (np.full(3, 1 / 3, dtype=np.float32), np.full(3, 1 / 3, dtype=np.float32)),
+                     "Gaussian Blur": (np.array([1, 2, 1], dtype=np.float32) / 4,
+                                       np.array([1, 2, 1], dtype=np.float32) / 4)}
 
 
 class EditorFrame(tk.Frame):
@@ -39,7 +53,11 @@ class EditorFrame(tk.Frame):
         self.parent = parent
         self.editor = Editor()
         self.base_photo = None
+        self.base_image = None
         self.photo = None
+        self.photo_pool = OrderedDict()  # bucketed (width, height) -> PhotoImage, least recently used first
+        self._io_pool = ThreadPoolExecutor(max_workers=2)
+        self.photo_source = None  # (source image, size, resample) self.photo was made from
         self.image_path = None
 
         # ===== Upper part: canvas and tools =====
@@ -56,7 +74,12 @@ class EditorFrame(tk.Frame):
         self.max_zoom = 5.0
 
         # Offset
+        self.pending_redraw = None
+        self.interacting = False
+        self.pending_settle = None
         self.pan_start = None
+        self.image_item_id = None
+        self.view_transform = None  # (image left, image top, scale) of the drawn image in canvas pixels
         self.offset_x = None
         self.offset_y = None
 
@@ -119,6 +142,7 @@ class EditorFrame(tk.Frame):
         base = img.copy()
         base.thumbnail((500, 400))
         self.disp_w, self.disp_h = base.size
+        self.base_image = base
         self.base_photo = ImageTk.PhotoImage(base)
         self.zoom = 1.0
         self.offset_x = 0
@@ -130,19 +154,88 @@ class EditorFrame(tk.Frame):
         Internal method to redraw image on the canvas,
         applying current zoom and pan offset.
         """
-        if not hasattr(self, "base_photo"):
+        if self.pending_redraw:
+            self.after_cancel(self.pending_redraw)
+            self.pending_redraw = None
+        if self.base_photo is None:
             return
 
-        zoomed = self.editor.current_image.copy()
         w = int(self.disp_w * self.zoom)
         h = int(self.disp_h * self.zoom)
-        zoomed = zoomed.resize((w, h), Image.Resampling.LANCZOS)
-        self.photo = ImageTk.PhotoImage(zoomed)
+        # Up to the display size the small base image has enough pixels, so the full
+        # resolution image is only resampled when zoomed in past it
+        source = self.base_image if self.zoom <= 1.0 else self.editor.current_image
+        # Cheap bilinear frames while the user zooms or pans, Lanczos once the view settles
+        resample = Image.Resampling.BILINEAR if self.interacting else Image.Resampling.LANCZOS
+        # Pan-only moves keep the zoom, so the current photo is only re-anchored
+        # (a settled Lanczos photo is good enough for the interactive frames too)
+        photo_changed = self.photo_source is None or self.photo_source[0] is not source or \
+            self.photo_source[1] != (w, h) or self.photo_source[2] not in (resample, Image.Resampling.LANCZOS)
+        if photo_changed:
+            zoomed = source.resize((w, h), resample)
+            previous_photo = self.photo
+            self.photo = self._pooled_photo(w, h)
+            self.photo.paste(zoomed)
+            self.photo_source = (source, (w, h), resample)
+            # Pasting into the displayed photo already updates the canvas
+            photo_changed = self.photo is not previous_photo
+
+        left = self.canvas.winfo_width() // 2 + int(self.offset_x) - w // 2
+        top = self.canvas.winfo_height() // 2 + int(self.offset_y) - h // 2
+        self.view_transform = (left, top, w / self.editor.current_image.width)
+        # The image item is created once and then only moved and given the new photo.
+        # It is anchored at its top left corner, the unused part of a pooled photo is transparent
+        if self.image_item_id is None:
+            self.image_item_id = self.canvas.create_image(left, top, image=self.photo, anchor=tk.NW)
+        else:
+            self.canvas.coords(self.image_item_id, left, top)
+            if photo_changed:
+                self.canvas.itemconfigure(self.image_item_id, image=self.photo)
+
+    def _pooled_photo(self, w, h):
+        """
+        Returns a blank PhotoImage with room for a w x h image.
+        Sizes are rounded up to PHOTO_BUCKET, so the bilinear and Lanczos frames of one zoom level
+        and nearby zoom levels share a photo instead of allocating a new Tk image each time.
+
+        :param w: Width of the image to paste
+        :param h: Height of the image to paste
+        :return: ImageTk.PhotoImage of the bucketed size
+        """
+        key = (-(-w // PHOTO_BUCKET) * PHOTO_BUCKET, -(-h // PHOTO_BUCKET) * PHOTO_BUCKET)
+        photo = self.photo_pool.pop(key, None)
+        if photo is None:
+            photo = ImageTk.PhotoImage("RGBA", key, width=key[0], height=key[1])
+        elif (w, h) != key:
+            # Clear what a larger earlier image left outside the new one
+            photo.tk.call(str(photo), "blank")
+        self.photo_pool[key] = photo
+        if len(self.photo_pool) > PHOTO_POOL_SIZE:
+            self.photo_pool.popitem(last=False)
+        return photo
 
-        self.canvas.delete("all")
-        cx = self.canvas.winfo_width() // 2 + int(self.offset_x)
-        cy = self.canvas.winfo_height() // 2 + int(self.offset_y)
-        self.canvas.create_image(cx, cy, image=self.photo, anchor=tk.CENTER)
+    def _schedule_redraw(self):
+        """
+        Schedules a canvas redraw for the next frame during zooming or panning.
+        Wheel and drag events arriving in the meantime are merged into that one redraw,
+        and a final high quality redraw follows once no event came for INTERACTION_SETTLE_MS.
+        """
+        if self.pending_redraw:
+            self.after_cancel(self.pending_redraw)
+        self.pending_redraw = self.after(REDRAW_DELAY_MS, self._redraw_canvas)
+
+        self.interacting = True
+        if self.pending_settle:
+            self.after_cancel(self.pending_settle)
+        self.pending_settle = self.after(INTERACTION_SETTLE_MS, self._finish_interaction)
+
+    def _finish_interaction(self):
+        """
+        Ends the zoom/pan interaction and redraws the view with full quality resampling.
+        """
+        self.pending_settle = None
+        self.interacting = False
+        self._redraw_canvas()
 
     def undo(self):
         """
@@ -181,7 +274,7 @@ class EditorFrame(tk.Frame):
         self.offset_y -= mouse_y * (scale - 1)
 
         self.zoom = new_zoom
-        self._redraw_canvas()
+        self._schedule_redraw()
 
     def pan_start_event(self, event):
         """
@@ -200,7 +293,7 @@ class EditorFrame(tk.Frame):
         self.pan_start = (event.x, event.y)
         self.offset_x += dx
         self.offset_y += dy
-        self._redraw_canvas()
+        self._schedule_redraw()
 
     def reset_changes(self):
         confirm = messagebox.askyesno("Reset the changes", "Are you sure you want to reset all the changes?")
@@ -257,21 +350,61 @@ class EditorFrame(tk.Frame):
     def upload_to_gallery(self):
         """
         Uploads the current image to the user's gallery (server-side).
-        Requires authentication.
+        Requires authentication. Encoding and upload run on a worker thread.
         """
         if not self.parent.username:
             messagebox.showwarning("Entrance is required", "Log in to upload the image.")
             return
 
-        try:
+        filename = os.path.basename(self.image_path) if self.image_path else "image.png"
+        data = self.editor.compressed_data
+        if data:
+            filename = os.path.splitext(filename)[0] + ".jpg"
+        # Editor operations replace current_image instead of modifying it,
+        # so the worker can encode this image while the user keeps editing
+        future = self._io_pool.submit(self._encode_and_upload, self.editor.current_image, filename, data)
+        future.add_done_callback(lambda f: self.after(0, self._on_upload_done, f))
+
+    def _encode_and_upload(self, image, filename, data=None):
+        """
+        Encodes an image for upload and sends it to the gallery (runs in the worker pool).
+
+        :param image: PIL image to upload
+        :param filename: Name to store the image under, its extension selects JPEG or PNG
+        :param data: Already encoded bytes to upload instead of the image (compressed JPEG)
+        :return: Server path of the uploaded image, None if the server rejected it
+        """
+        if not data:
             buffer = io.BytesIO()
-            self.editor.current_image.save(buffer, format='PNG')
-            data = buffer.getvalue()
-            filename = os.path.basename(self.image_path) if self.image_path else "image.png"
-            self.parent.client.upload(filename, data)
-            messagebox.showinfo("Success", "The image has been successfully uploaded to the gallery.")
+            if os.path.splitext(filename)[1].lower() in (".jpg", ".jpeg"):
+                # Photos stay JPEG, a PNG of a photo is several times larger to upload
+                if image.mode not in ("RGB", "L"):
+                    image = image.convert("RGB")
+                image.save(buffer, format='JPEG', quality=UPLOAD_JPEG_QUALITY, optimize=True)
+            else:
+                image.save(buffer, format='PNG')
+            # A view of the encoded bytes, sent without copying them out of the buffer
+            data = buffer.getbuffer()
+        return self.parent.client.upload(filename, data)
+
+    def _on_upload_done(self, future):
+        """
+        Reports the outcome of a finished upload (on the Tk thread).
+        """
+        if not self.winfo_exists():
+            return
+
+        try:
+            server_path = future.result()
         except Exception as e:
             messagebox.showerror("Error", f"Couldn't upload image:\n{e}")
+            return
+
+        if server_path is None:
+            messagebox.showerror("Error", "Couldn't upload image:\nThe server rejected the upload.")
+            return
+        self.parent.invalidate("Gallery")
+        messagebox.showinfo("Success", "The image has been successfully uploaded to the gallery.")
 
     def open_resize_window(self):
         """
@@ -290,6 +423,7 @@ class EditorFrame(tk.Frame):
         def apply():
             if self.editor.current_image:
                 size = RESOLUTIONS[var.get()]
+                self.editor.save_state()
                 self.editor.current_image = self.editor.resize_image(size)
                 self.display_image(self.editor.current_image)
                 window.destroy()
@@ -320,9 +454,12 @@ class EditorFrame(tk.Frame):
 
         def apply():
             quality = quality_options[var.get()]
-            compressed_img = self.editor.compress_image(quality)
-            if compressed_img:
-                self.editor.current_image = compressed_img
+            compressed_data = self.editor.compress_image(quality)
+            if compressed_data:
+                self.editor.save_state()
+                self.editor.current_image = Image.open(io.BytesIO(compressed_data))
+                # Kept so an upload sends these bytes instead of encoding the image again
+                self.editor.compressed_data = compressed_data
                 self.display_image(self.editor.current_image)
             window.destroy()
 
@@ -387,11 +524,16 @@ class EditorFrame(tk.Frame):
         """
         self.manual_crop_mode = not self.manual_crop_mode
         if not self.manual_crop_mode:
-            if self.crop_rect_id:
-                self.canvas.delete(self.crop_rect_id)
-                self.crop_rect_id = None
+            self._hide_crop_rect()
             self.crop_start = None
 
+    def _hide_crop_rect(self):
+        """
+        Hides the crop rectangle. The canvas item is kept and reused for the next selection.
+        """
+        if self.crop_rect_id:
+            self.canvas.itemconfigure(self.crop_rect_id, state="hidden")
+
     def start_crop(self, event):
         """
         Mouse-down event to start drawing manual crop rectangle.
@@ -399,9 +541,11 @@ class EditorFrame(tk.Frame):
         if not (self.manual_crop_mode and self.editor.current_image):
             return
         self.crop_start = (event.x, event.y)
-        if self.crop_rect_id:
-            self.canvas.delete(self.crop_rect_id)
-            self.crop_rect_id = None
+        if self.crop_rect_id is None:
+            self.crop_rect_id = self.canvas.create_rectangle(0, 0, 0, 0, outline="red", width=2, state="hidden")
+        else:
+            self._hide_crop_rect()
+            self.canvas.tag_raise(self.crop_rect_id)
 
     def draw_crop_rect(self, event):
         """
@@ -410,11 +554,9 @@ class EditorFrame(tk.Frame):
         if not (self.manual_crop_mode and self.crop_start):
             return
         x0, y0 = self.crop_start
-        x1, y1 = event.x, event.y
-
-        if self.crop_rect_id:
-            self.canvas.delete(self.crop_rect_id)
-        self.crop_rect_id = self.canvas.create_rectangle(x0, y0, x1, y1, outline="red", width=2)
+        canvas, rect_id = self.canvas, self.crop_rect_id
+        canvas.coords(rect_id, x0, y0, event.x, event.y)
+        canvas.itemconfigure(rect_id, state="normal")
 
     def finish_crop(self, event):
         """
@@ -422,38 +564,26 @@ class EditorFrame(tk.Frame):
 
         Converts canvas coordinates to actual image coordinates using scale and offset.
         """
-        if not (self.manual_crop_mode and self.crop_start and self.editor.current_image):
+        if not (self.manual_crop_mode and self.crop_start and self.editor.current_image and self.view_transform):
             return
 
         x0, y0 = self.crop_start
         x1, y1 = event.x, event.y
 
         orig_w, orig_h = self.editor.current_image.size
-        disp_w, disp_h = self.disp_w, self.disp_h
-
-        canvas_w = self.canvas.winfo_width()
-        canvas_h = self.canvas.winfo_height()
-        img_left = canvas_w // 2 - disp_w // 2 + self.offset_x
-        img_top = canvas_h // 2 - disp_h // 2 + self.offset_y
-
-        scale = disp_w / orig_w
+        # The transform of the image as it was last drawn, so zoom and pan are accounted for
+        img_left, img_top, scale = self.view_transform
 
-        left = int((min(x0, x1) - img_left) / scale)
-        top = int((min(y0, y1) - img_top) / scale)
-        right = int((max(x0, x1) - img_left) / scale)
-        bottom = int((max(y0, y1) - img_top) / scale)
-
-        left, right = max(0, left), min(orig_w, right)
-        top, bottom = max(0, top), min(orig_h, bottom)
+        corners = (np.array([min(x0, x1), min(y0, y1), max(x0, x1), max(y0, y1)])
+                   - (img_left, img_top, img_left, img_top)) / scale
+        left, top, right, bottom = np.clip(corners.astype(int), 0, (orig_w, orig_h, orig_w, orig_h)).tolist()
 
         if right - left > 0 and bottom - top > 0:
             self.editor.crop_rect(left, top, right, bottom)
             self.display_image(self.editor.current_image)
 
         self.crop_start = None
-        if self.crop_rect_id:
-            self.canvas.delete(self.crop_rect_id)
-            self.crop_rect_id = None
+        self._hide_crop_rect()
 
     def open_filters_window(self):
         """
@@ -480,11 +610,13 @@ class EditorFrame(tk.Frame):
 
         def apply_filter():
             key = var.get()
-            kernel = KERNELS[key]
 
             if not mix_var.get():
                 self.editor.reset()
-            self.editor.apply_kernel(kernel)
+            if key in SEPARABLE_KERNELS:
+                self.editor.apply_separable(*SEPARABLE_KERNELS[key])
+            else:
+                self.editor.apply_kernel(FLIPPED_KERNELS[key], flipped=True)
             self.display_image(self.editor.current_image)
             window.destroy()
 
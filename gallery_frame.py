@@ -1,7 +1,172 @@
+import io
 import os
+import threading
 import tkinter as tk
+import weakref
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from tkinter import ttk, Toplevel, Label, messagebox
 from PIL import Image, ImageTk
+from client import NotFound
+from disk_cache import DiskLRU
+
+THUMBS_DIR = ".thumbs"
+GALLERY_CACHE_DIR = "temp_gallery_cache"
+GALLERY_WORKERS = 6
+THUMB_CELL_SIZE = (170, 200)  # Fixed (width, height) of a grid cell: thumbnail plus caption
+FULL_IMAGE_CACHE_SIZE = 6
+FULL_VIEW_SIZE = (800, 600)
+THUMB_CACHE_SIZE = 256
+
+# Thumbnails shared by the gallery and the chats: (path, mtime, size) -> PhotoImage, least recently used first
+_thumb_cache = OrderedDict()
+# Every thumbnail still referenced by a widget, including those evicted from _thumb_cache
+_live_thumbs = weakref.WeakValueDictionary()
+
+
+def _thumb_cache_key(path, size):
+    """
+    Builds the thumbnail cache key of a local image.
+    The modification time is part of the key, so a rewritten file is decoded again.
+
+    :return: Cache key, or None if the file does not exist
+    """
+    try:
+        return path, os.path.getmtime(path), size
+    except OSError:
+        return None
+
+
+def get_cached_thumb(path, size):
+    """
+    Returns the cached PhotoImage thumbnail of a local image, or None on a miss.
+    A thumbnail that was evicted but is still shown somewhere is found as well and cached again.
+    Must be called on the Tk thread.
+    """
+    key = _thumb_cache_key(path, size)
+    if key is None:
+        return None
+    photo = _thumb_cache.get(key)
+    if photo is not None:
+        _thumb_cache.move_to_end(key)
+        return photo
+
+    photo = _live_thumbs.get(key)
+    if photo is not None:
+        _store_thumb(key, photo)
+    return photo
+
+
+def put_cached_thumb(path, size, photo):
+    """
+    Stores a PhotoImage thumbnail in the cache, evicting the least recently used entries.
+    Must be called on the Tk thread.
+    """
+    key = _thumb_cache_key(path, size)
+    if key is not None:
+        _store_thumb(key, photo)
+
+
+def _store_thumb(key, photo):
+    """
+    Puts a thumbnail under its cache key, evicting the least recently used entries.
+    """
+    _thumb_cache[key] = photo
+    _thumb_cache.move_to_end(key)
+    _live_thumbs[key] = photo
+    while len(_thumb_cache) > THUMB_CACHE_SIZE:
+        _thumb_cache.popitem(last=False)
+
+
+def clear_cached_thumbs():
+    """
+    Drops the cache's references to the PhotoImage thumbnails (e.g. on logout).
+    Thumbnails still shown by a widget stay available until that widget is destroyed.
+    """
+    _thumb_cache.clear()
+
+
+def gallery_cache_dir(user_id):
+    """
+    Returns the local cache folder of a user's gallery images. Every user has their own,
+    so equally named files of different users are not mixed up and the folder can be dropped on logout.
+    """
+    return os.path.join(GALLERY_CACHE_DIR, str(user_id))
+
+
+def _thumbnail_path(image_path, size):
+    """
+    Returns the path of the persisted thumbnail of a local image,
+    kept in a .thumbs folder next to the image.
+    """
+    directory, filename = os.path.split(image_path)
+    return os.path.join(directory, THUMBS_DIR, f"{filename}_{size[0]}x{size[1]}.png")
+
+
+def _thumbnail_is_fresh(image_path, size):
+    """
+    Checks whether a persisted thumbnail exists and is not older than its image.
+    """
+    try:
+        return os.path.getmtime(_thumbnail_path(image_path, size)) >= os.path.getmtime(image_path)
+    except OSError:
+        return False
+
+
+def open_cached_thumbnail(image_path, size):
+    """
+    Opens the persisted PNG thumbnail of a local image with Tk's own decoder,
+    skipping the PIL decode and pixel copy of ImageTk.PhotoImage.
+    Must be called on the Tk thread.
+
+    :param image_path: Local path to the original image
+    :param size: Maximum (width, height) of the thumbnail
+    :return: tk.PhotoImage, or None if there is no thumbnail newer than the image
+    """
+    if not _thumbnail_is_fresh(image_path, size):
+        return None
+    try:
+        return tk.PhotoImage(file=_thumbnail_path(image_path, size))
+    except tk.TclError:
+        return None
+
+
+def load_thumbnail(image_path, size, source=None):
+    """
+    Decodes a downsized copy of a local image and persists it as PNG,
+    so later opens can go through open_cached_thumbnail.
+    Does not touch any Tk objects, so it may run in a worker thread.
+
+    :param image_path: Local path to the original image
+    :param size: Maximum (width, height) of the thumbnail
+    :param source: File object with the image's bytes, to decode instead of reading image_path again
+    :return: Thumbnail as PIL image
+    """
+    thumb_path = _thumbnail_path(image_path, size)
+
+    with Image.open(source or image_path) as image:
+        # Let libjpeg decode at a reduced scale, but keep twice the target size
+        # so the final filter still has pixels to average
+        image.draft("RGB", (size[0] * 2, size[1] * 2))
+        if image.mode not in ("RGB", "RGBA"):
+            # Palette and bilevel images can only be resampled after conversion
+            image = image.convert("RGBA")
+        # Formats without draft support (PNG, BMP) are shrunk by averaging whole blocks of pixels,
+        # which is much cheaper than a filtered resize, down to at least twice the target size.
+        # The filter then only covers the last step, so Lanczos costs about as much as bilinear
+        factor = min(image.width // (size[0] * 2), image.height // (size[1] * 2))
+        if factor > 1:
+            image = image.reduce(factor)
+        image.thumbnail(size, Image.Resampling.LANCZOS, reducing_gap=None)
+        # thumbnail() leaves images already within size unloaded, read them before the file is closed
+        image.load()
+
+    try:
+        os.makedirs(os.path.dirname(thumb_path), exist_ok=True)
+        image.save(thumb_path, "PNG", compress_level=1)
+    except OSError as e:
+        print(f"Error saving the thumbnail of {image_path}: {e}")
+    return image
 
 
 class GalleryFrame(tk.Frame):
@@ -21,13 +186,13 @@ class GalleryFrame(tk.Frame):
         super().__init__(parent)
         self.client = client
         self.user_id = user_id
-        self.cache_dir = "temp_gallery_cache"
+        self.cache_dir = gallery_cache_dir(user_id)
         os.makedirs(self.cache_dir, exist_ok=True)
 
         self.canvas = tk.Canvas(self)
         self.scrollbar = ttk.Scrollbar(self, orient="vertical", command=self.canvas.yview)
         self.scrollable_frame = ttk.Frame(self.canvas)
-        self.scrollable_frame.bind("<Configure>", lambda e: self.canvas.configure(scrollregion=self.canvas.bbox("all")))
+        self.scrollable_frame.bind("<Configure>", lambda e: self._schedule_scrollregion())
 
         self.canvas.create_window((0, 0), window=self.scrollable_frame, anchor="nw")
         self.canvas.configure(yscrollcommand=self.scrollbar.set)
@@ -36,45 +201,195 @@ class GalleryFrame(tk.Frame):
         self.scrollbar.pack(side="right", fill="y")
 
         self.thumbnail_size = (150, 150)
+        self._pool = ThreadPoolExecutor(max_workers=GALLERY_WORKERS)
+        # The image list has its own worker, so it is not queued behind thumbnail downloads
+        self._list_pool = ThreadPoolExecutor(max_workers=1)
+        self._loading_gallery = False
+        self._gallery_generation = 0
+        self._thumbnail_futures = []  # Pool jobs of the current load, cancelled when it is replaced
+        self._ready_thumbnails = []  # (generation, index, filename, path, image) waiting to be added to the grid
+        self._flush_pending = None
+        self._scrollregion_pending = None
+        self._full_cache = OrderedDict()  # (image path, mtime) -> decoded PIL image, least recently opened first
+
+    def attach(self, user_id):
+        """
+        Binds the gallery to a newly logged-in user. The widgets are kept,
+        the images are listed again by load_gallery.
+
+        :param user_id: Current user's ID
+        """
+        self.user_id = user_id
+        self.cache_dir = gallery_cache_dir(user_id)
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def detach(self):
+        """
+        Removes the thumbnails of the logged-out user and drops the references to them.
+        Downloads of that user not started yet are cancelled, the results of running ones are discarded.
+        """
+        self._gallery_generation += 1
+        self._cancel_thumbnail_futures()
+        self._loading_gallery = False
+        self._ready_thumbnails = []
+        self._full_cache.clear()
+        for widget in self.scrollable_frame.winfo_children():
+            widget.destroy()
+        self._schedule_scrollregion()
+
+    def _cancel_thumbnail_futures(self):
+        """
+        Cancels the downloads of the previous load that are still queued on the pool.
+        """
+        for future in self._thumbnail_futures:
+            future.cancel()
+        self._thumbnail_futures = []
+
+    def _schedule_scrollregion(self):
+        """
+        Updates the scroll region once the current batch of grid changes is laid out,
+        instead of on every Configure event while thumbnails are added.
+        """
+        if self._scrollregion_pending is None:
+            self._scrollregion_pending = self.after_idle(self._update_scrollregion)
+
+    def _update_scrollregion(self):
+        """Fits the scroll region to the laid out thumbnail grid."""
+        self._scrollregion_pending = None
+        self.canvas.configure(scrollregion=self.canvas.bbox("all"))
 
     def load_gallery(self):
         """
         Fetches the user's image list from the server and displays them as thumbnails.
-        Clears previous content before loading.
+        Clears previous content before loading. The list request, downloads and thumbnail decoding
+        run on worker pools, each thumbnail is added to the grid as soon as it is ready.
+        Calls while the list is still being fetched are ignored.
+        """
+        if self._loading_gallery:
+            return
+        self._loading_gallery = True
+        generation = self._gallery_generation
+        future = self._list_pool.submit(self.client.get_gallery)
+        future.add_done_callback(lambda f: self.after(0, self._apply_gallery, f, generation))
+
+    def _apply_gallery(self, future, generation):
+        """
+        Replaces the thumbnail grid with the fetched image list (on the Tk thread).
+        The list is dropped if the user logged out since it was requested.
         """
-        files = self.client.get_gallery()
+        if not self.winfo_exists() or generation != self._gallery_generation:
+            return
+        self._loading_gallery = False
+
+        try:
+            files = future.result()
+        except Exception as e:
+            print(f"Request error: {e}")
+            return
+
         for widget in self.scrollable_frame.winfo_children():
             widget.destroy()
 
+        # Results of an earlier, still running load are dropped
+        self._gallery_generation += 1
+        generation = self._gallery_generation
+        self._cancel_thumbnail_futures()
+
         for i, file_info in enumerate(files):
             name = file_info["name"]
             path = file_info["path"]
-            cached_path = self.download_and_cache(path, name)
-            if cached_path:
-                self.display_thumbnail(i, name, cached_path)
+            future = self._pool.submit(self._prepare_thumbnail, path, name, self.cache_dir, generation)
+            future.add_done_callback(
+                lambda f, i=i, name=name: self.after(0, self._on_thumbnail_ready, f, generation, i, name))
+            self._thumbnail_futures.append(future)
 
-    def download_and_cache(self, file_path, filename):
+    def _prepare_thumbnail(self, file_path, filename, cache_dir, generation):
+        """
+        Downloads an image and decodes its thumbnail, without touching Tk (runs in the pool).
+        The cache folder is fixed when the job is submitted, so a job of a logged-out user
+        never writes into the folder of the next one.
+
+        :param file_path: Remote path to image on the server
+        :param filename: Local filename to store
+        :param cache_dir: Cache folder of the user the gallery was loaded for
+        :param generation: Load the job belongs to, nothing is done once a newer load replaced it
+        :return: (local file path or None, decoded thumbnail or None if Tk can reuse a cached one)
+        """
+        if generation != self._gallery_generation:
+            return None, None
+        cached_path = self.download_and_cache(file_path, filename, cache_dir)
+        if not cached_path:
+            return None, None
+        if _thumb_cache_key(cached_path, self.thumbnail_size) in _thumb_cache or \
+                _thumbnail_is_fresh(cached_path, self.thumbnail_size):
+            return cached_path, None
+        return cached_path, load_thumbnail(cached_path, self.thumbnail_size)
+
+    def _on_thumbnail_ready(self, future, generation, index, filename):
+        """
+        Adds a prepared thumbnail to the grid (on the Tk thread).
+        """
+        if generation != self._gallery_generation or future.cancelled() or not self.winfo_exists():
+            return
+
+        try:
+            cached_path, image = future.result()
+        except Exception as e:
+            print(f"Error during uploading {filename}: {e}")
+            return
+        if cached_path:
+            # Thumbnails finishing close together are added to the grid in one batch
+            self._ready_thumbnails.append((generation, index, filename, cached_path, image))
+            if self._flush_pending is None:
+                self._flush_pending = self.after_idle(self._flush_thumbnails)
+
+    def _flush_thumbnails(self):
+        """
+        Adds all thumbnails that became ready since the last flush to the grid.
+        """
+        self._flush_pending = None
+        ready, self._ready_thumbnails = self._ready_thumbnails, []
+        for generation, index, filename, cached_path, image in ready:
+            if generation == self._gallery_generation:
+                self.display_thumbnail(index, filename, cached_path, image)
+
+    def download_and_cache(self, file_path, filename, cache_dir=None):
         """
         Downloads the image from the server if it's not already cached locally.
 
         :param file_path: Remote path to image on the server
         :param filename: Local filename to store
+        :param cache_dir: Folder to store it in, the current user's cache folder by default
         :return: Local file path if successful, None otherwise
         """
-        local_path = os.path.join(self.cache_dir, filename)
+        local_path = os.path.join(cache_dir or self.cache_dir, filename)
         if os.path.exists(local_path):
+            DiskLRU.touch(local_path)
             return local_path
 
-        file_data = self.client.download(file_path)
+        try:
+            file_data = self.client.download(file_path)
+        except NotFound:
+            return None
         if file_data is None:
             return None
 
-        with open(local_path, "wb") as f:
+        # Written under a temporary name, so a concurrent load never sees a partial file
+        temp_path = f"{local_path}.part{threading.get_ident()}"
+        with open(temp_path, "wb") as f:
             f.write(file_data)
+        os.replace(temp_path, local_path)
+
+        # The thumbnail sidecar is written from the bytes still in memory,
+        # so later loads (and restarts) only read the small PNG
+        try:
+            load_thumbnail(local_path, self.thumbnail_size, io.BytesIO(file_data))
+        except OSError as e:
+            print(f"Error creating the thumbnail of {filename}: {e}")
 
         return local_path
 
-    def display_thumbnail(self, index, filename, image_path):
+    def display_thumbnail(self, index, filename, image_path, image=None):
         """
         Displays a single image thumbnail with filename caption.
         Left-click opens full screen view, right-click opens send-to-chat menu.
@@ -82,13 +397,23 @@ class GalleryFrame(tk.Frame):
         :param index: Position in the thumbnail grid
         :param filename: Name of the file
         :param image_path: Local path to the image
+        :param image: Thumbnail already decoded by a worker, only the PhotoImage is built here
         """
         try:
-            image = Image.open(image_path)
-            image.thumbnail(self.thumbnail_size)
-            thumbnail = ImageTk.PhotoImage(image)
+            # The same PhotoImage is reused every time the gallery is reloaded
+            thumbnail = get_cached_thumb(image_path, self.thumbnail_size)
+            if thumbnail is None:
+                if image is None:
+                    thumbnail = open_cached_thumbnail(image_path, self.thumbnail_size)
+                if thumbnail is None:
+                    if image is None:
+                        image = load_thumbnail(image_path, self.thumbnail_size)
+                    thumbnail = ImageTk.PhotoImage(image)
+                put_cached_thumb(image_path, self.thumbnail_size, thumbnail)
 
-            frame = ttk.Frame(self.scrollable_frame)
+            # A fixed cell size means a new thumbnail never resizes the rest of the grid
+            frame = ttk.Frame(self.scrollable_frame, width=THUMB_CELL_SIZE[0], height=THUMB_CELL_SIZE[1])
+            frame.pack_propagate(False)
             frame.grid(row=index // 4, column=index % 4, padx=10, pady=10)
 
             label = Label(frame, image=thumbnail)
@@ -109,15 +434,52 @@ class GalleryFrame(tk.Frame):
         :param image_path: Local path to the image to display
         """
         try:
-            img = Image.open(image_path)
+            # Reopening one of the last few images skips decoding it again
+            key = (image_path, os.path.getmtime(image_path))
+            img = self._full_cache.get(key)
+            if img is None:
+                with Image.open(image_path) as source:
+                    # A preview never needs more pixels than the screen has
+                    source.draft("RGB", (self.winfo_screenwidth(), self.winfo_screenheight()))
+                    img = source.copy()
+                self._full_cache[key] = img
+                if len(self._full_cache) > FULL_IMAGE_CACHE_SIZE:
+                    self._full_cache.popitem(last=False)
+            else:
+                self._full_cache.move_to_end(key)
+
             win = Toplevel(self)
             win.title("Viewing")
-            win.geometry("800x600")
+            win.geometry(f"{FULL_VIEW_SIZE[0]}x{FULL_VIEW_SIZE[1]}")
 
-            screen_image = ImageTk.PhotoImage(img)
-            label = Label(win, image=screen_image)
-            label.image = screen_image
+            label = Label(win)
             label.pack(expand=True, fill="both")
+            fitted = {"size": None, "pending": None}
+
+            def fit_to_window():
+                # Only a copy scaled to the window is turned into a PhotoImage, not the whole bitmap
+                fitted["pending"] = None
+                width, height = label.winfo_width(), label.winfo_height()
+                if width <= 1 or height <= 1:
+                    width, height = FULL_VIEW_SIZE
+                if fitted["size"] == (width, height):
+                    return
+                fitted["size"] = (width, height)
+
+                scale = min(width / img.width, height / img.height, 1.0)
+                size = (max(1, round(img.width * scale)), max(1, round(img.height * scale)))
+                preview = img.resize(size, Image.Resampling.LANCZOS, reducing_gap=2.0) if scale < 1.0 else img
+                screen_image = ImageTk.PhotoImage(preview)
+                label.configure(image=screen_image)
+                label.image = screen_image
+
+            def on_configure(event):
+                # Resizing the window fires many Configure events, they are merged into one refit
+                if fitted["pending"] is None:
+                    fitted["pending"] = label.after_idle(fit_to_window)
+
+            fit_to_window()
+            label.bind("<Configure>", on_configure)
         except Exception as e:
             messagebox.showerror("Error", f"Couldn't open the image: {e}")
 
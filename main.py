@@ -1,16 +1,49 @@
+import logging
+import threading
+import time
 import tkinter as tk
+from logging.handlers import RotatingFileHandler
 from tkinter import messagebox, ttk
 from editor_frame import EditorFrame
 from auth_frame import AuthFrame
-from chat_frame import ChatFrame
-from gallery_frame import GalleryFrame
+from chat_frame import ChatFrame, CHATS_CACHE_DIR
+from gallery_frame import GalleryFrame, GALLERY_CACHE_DIR, clear_cached_thumbs
 from client import Client
-import time
-import shutil
-import os
+from disk_cache import DiskLRU
 
 SERVER_IP = "172.16.7.99"
 SERVER_PORT = 443
+# Notebook position of the Authorization tab, the tabs in front of it never move
+TAB_AUTH = 1
+TAB_SETTLE_MS = 120  # Tabs passed through faster than this while cycling are not loaded
+CACHE_GC_DELAY_MS = 1000  # The cache cleanup starts once the window is up
+LOG_FILE = "client.log"
+LOG_MAX_BYTES = 1024 * 1024
+LOG_REPEAT_INTERVAL = 5  # Seconds during which the same message is logged only once
+
+log = logging.getLogger("client.main")
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Drops records whose message was already logged less than interval seconds ago,
+    so a failure repeating in a callback does not flood the log.
+    """
+    def __init__(self, interval=LOG_REPEAT_INTERVAL):
+        """
+        :param interval: Seconds during which repeats of a message are dropped
+        """
+        super().__init__()
+        self.interval = interval
+        self.last_logged = {}  # (format string, level) -> time it was last let through
+
+    def filter(self, record):
+        key = record.msg, record.levelno
+        now = time.monotonic()
+        if now - self.last_logged.get(key, -self.interval) < self.interval:
+            return False
+        self.last_logged[key] = now
+        return True
 
 
 class MainApplication(tk.Tk):
@@ -30,7 +63,16 @@ class MainApplication(tk.Tk):
 
         self.username = None
         self.user_id = None
+        # Tabs whose data may have changed since they were last loaded
+        self.dirty = {"Chats": True, "Gallery": True}
         self.client = Client(SERVER_IP, SERVER_PORT)
+        self.client.on_incoming_message = lambda message: self.after(0, self.invalidate, "Chats")
+
+        # Downloaded images are kept in per-user folders until that user logs out,
+        # beyond the caps the least recently used ones are evicted
+        self.gallery_cache = DiskLRU(GALLERY_CACHE_DIR)
+        self.chats_cache = DiskLRU(CHATS_CACHE_DIR)
+        self.after(CACHE_GC_DELAY_MS, self._gc_caches)
 
         self.notebook = ttk.Notebook(self)
         self.notebook.pack(fill=tk.BOTH, expand=True)
@@ -47,109 +89,222 @@ class MainApplication(tk.Tk):
         self.gallery_stub_frame = tk.Frame(self)
         self.gallery_label = tk.Label(self.gallery_stub_frame, text="Gallery (only for authorized users)")
         self.gallery_label.pack(pady=20)
-        self.gallery_widget = self.gallery_stub_frame
-        self.notebook.add(self.gallery_widget, text="Gallery")
+        self.notebook.add(self.gallery_stub_frame, text="Gallery")
 
         # Chat tab
         self.chats_stub_frame = tk.Frame(self)
         self.chat_label = tk.Label(self.chats_stub_frame, text="Chats (only for authorized users)")
         self.chat_label.pack(pady=20)
-        self.chat_widget = self.chats_stub_frame
-        self.notebook.add(self.chat_widget, text="Chats")
+        self.notebook.add(self.chats_stub_frame, text="Chats")
+
+        # The real frames are built when their tab is first opened and then kept for later logins,
+        # logging in and out only hides one of the pair of tabs and shows the other
+        self.gallery_widget = None
+        self.chat_widget = None
 
+        # Widget path of the tab -> handler called when it is selected
+        self.tab_handlers = {str(self.gallery_stub_frame): self._build_gallery,
+                             str(self.chats_stub_frame): self._build_chats}
+        self._pending_tab = None
         self.notebook.bind("<<NotebookTabChanged>>", self.check_authentication)
         self.protocol("WM_DELETE_WINDOW", self.on_close)
 
+    def _gc_caches(self):
+        """
+        Trims both image caches in a background thread.
+        """
+        def run():
+            self.gallery_cache.gc()
+            self.chats_cache.gc()
+
+        threading.Thread(target=run, daemon=True).start()
+
     def on_login_success(self, username, user_id):
         """
         Callback method executed after successful login or sign-up.
 
         - Updates user session state.
-        - Replaces placeholder Gallery and Chat tabs with full-featured ones.
-        - Loads gallery content if available.
+        - Shows the Gallery and Chat tabs of an earlier session, bound to the new user.
+          Those not built yet are built when first opened.
 
         :param username: Display name of the logged-in user
         :param user_id: Unique ID of the logged-in user
         """
         self.username = username
         self.user_id = user_id
-        print(f"The entry is made as: {username}")
+        self.dirty = {"Chats": True, "Gallery": True}
 
-        self.notebook.forget(self.chat_widget)
-        self.chat_widget = ChatFrame(self, self.client, username, user_id)
-        self.client.set_chat_frame(self.chat_widget)
-        self.notebook.add(self.chat_widget, text="Chats")
+        chat_widget = self.chat_widget
+        gallery_widget = self.gallery_widget
+        if chat_widget is not None:
+            chat_widget.attach(username, user_id)
+            self.client.set_chat_frame(chat_widget)
+            self._show_tab(chat_widget, self.chats_stub_frame)
+        if gallery_widget is not None:
+            gallery_widget.attach(user_id)
+            self._show_tab(gallery_widget, self.gallery_stub_frame)
+        log.debug("The entry is made as: %s", username)
 
-        self.notebook.forget(self.gallery_widget)
-        self.gallery_widget = GalleryFrame(self, self.client, user_id)
-        self.notebook.add(self.gallery_widget, text="Gallery")
+    def _add_tab(self, frame, stub, text, handler):
+        """
+        Adds a newly built frame to the notebook right before its stub, shows it and hides the stub.
 
-        if hasattr(self.gallery_widget, "load_gallery"):
-            self.gallery_widget.load_gallery()
+        :param frame: Frame of the tab
+        :param stub: Stub frame shown in its place while logged out
+        :param text: Tab title
+        :param handler: Called when the tab is selected
+        """
+        self.tab_handlers[str(frame)] = handler
+        self.notebook.insert(stub, frame, text=text)
+        self._show_tab(frame, stub)
+
+    def _show_tab(self, frame, stub):
+        """
+        Shows a frame in place of its stub. If the stub was selected, the frame is selected.
+        """
+        notebook = self.notebook
+        notebook.tab(frame, state="normal")
+        if notebook.select() == str(stub):
+            notebook.select(frame)
+        notebook.hide(stub)
+
+    def _hide_tab(self, frame, stub):
+        """
+        Shows a stub in place of its frame. If the frame was selected, the Authorization tab is selected.
+        """
+        notebook = self.notebook
+        notebook.tab(stub, state="normal")
+        if notebook.select() == str(frame):
+            notebook.select(TAB_AUTH)
+        notebook.hide(frame)
+
+    def invalidate(self, tab):
+        """
+        Marks the data of a tab as changed on the server,
+        so it is reloaded the next time the tab is opened.
+
+        :param tab: "Chats" or "Gallery"
+        """
+        self.dirty[tab] = True
 
     def check_authentication(self, event):
         """
         Triggered whenever the user switches between tabs.
+        The tab is only handled once it stayed selected for TAB_SETTLE_MS,
+        so cycling through the tabs does not load every one passed on the way.
+
+        :param event: Tkinter event object from tab switching
+        """
+        if self._pending_tab is not None:
+            self.after_cancel(self._pending_tab)
+        self._pending_tab = self.after(TAB_SETTLE_MS, self._on_tab_settled, event.widget.select())
+
+    def _on_tab_settled(self, tab):
+        """
+        Handles the tab the user stopped at.
         - Verifies if the user is authenticated before accessing Gallery or Chats.
         - Displays warning and redirects to log in tab if not authorized.
-        - Reloads chat or gallery data if the user is logged in.
+        - Reloads chat or gallery data if the user is logged in and it changed since the last load.
 
-        :param event: Tkinter event object from tab switching
+        :param tab: Widget path of the tab selected when the timer was started
         """
-        current_tab = self.notebook.select()
-        tab_text = self.notebook.tab(current_tab, "text")
+        self._pending_tab = None
+        if self.notebook.select() != tab:
+            return
+        handler = self.tab_handlers.get(tab)
+        if handler is None:
+            return
 
-        if tab_text in ["Gallery", "Chats"] and not self.username:
+        if not self.username:
             tk.messagebox.showwarning("Entrance is required", "Please log in to your account for access.")
-            self.notebook.select(1)
-        elif tab_text == "Chats" and self.username:
-            if hasattr(self.chat_widget, "load_chats"):
-                self.chat_widget.load_chats()
-        elif tab_text == "Gallery" and self.username:
-            if hasattr(self.gallery_widget, "load_gallery"):
-                self.gallery_widget.load_gallery()
+            self.notebook.select(TAB_AUTH)
+        else:
+            handler()
+
+    def _build_chats(self):
+        """
+        Builds the chat frame when the Chats stub is opened by a logged-in user.
+        Selecting the new tab loads the chat list.
+        """
+        if self.chat_widget is None:
+            self.chat_widget = ChatFrame(self, self.client, self.username, self.user_id)
+            self.client.set_chat_frame(self.chat_widget)
+            self._add_tab(self.chat_widget, self.chats_stub_frame, "Chats", self._enter_chats)
+
+    def _enter_chats(self):
+        """
+        Reloads the chat list when the Chats tab is opened and its data changed.
+        """
+        if self.dirty["Chats"]:
+            self.dirty["Chats"] = False
+            self.chat_widget.load_chats()
+
+    def _build_gallery(self):
+        """
+        Builds the gallery frame when the Gallery stub is opened by a logged-in user.
+        Selecting the new tab loads the gallery.
+        """
+        if self.gallery_widget is None:
+            self.gallery_widget = GalleryFrame(self, self.client, self.user_id)
+            self._add_tab(self.gallery_widget, self.gallery_stub_frame, "Gallery", self._enter_gallery)
+
+    def _enter_gallery(self):
+        """
+        Reloads the gallery when the Gallery tab is opened and its data changed.
+        """
+        if self.dirty["Gallery"]:
+            self.dirty["Gallery"] = False
+            self.gallery_widget.load_gallery()
 
     def on_close(self):
         self.reset_client()
+        if self._pending_tab is not None:
+            self.after_cancel(self._pending_tab)
+        try:
+            self.client.close()
+        except Exception:
+            log.exception("Error when closing the client")
         self.destroy()
 
     def reset_client(self):
         """
-        Resets the current client connection and session state.
+        Resets the client session state.
 
-        - Clears temporary gallery cache.
-        - Closes existing client socket (if any).
-        - Creates new Client instance and updates frame references.
-        - Resets username and replaces Gallery/Chat tabs with stub versions.
+        - Logs the user out on the server, the connection itself is kept for the next login.
+        - Resets username, releases in-memory thumbnails and hides the Gallery/Chat tabs behind their stubs.
+        - Drops the images cached on disk for the logged-out user, those of other users are kept.
         """
+        user_id = self.user_id
         try:
-            shutil.rmtree("temp_gallery_cache")
-            os.makedirs("temp_gallery_cache", exist_ok=True)
-            shutil.rmtree("temp_chats_cache")
-            os.makedirs("temp_chats_cache", exist_ok=True)
-        except Exception as e:
-            print(f"Error clearing the cache: {e}")
-
-        try:
-            self.client.exit()
-        except Exception as e:
-            print(f"Error when resetting the client: {e}")
+            self.client.reset_session()
+        except Exception:
+            log.exception("Error when resetting the client")
 
-        time.sleep(0.1)
-        self.client = Client(SERVER_IP, SERVER_PORT)
-        self.auth_frame.client = self.client
-        self.editor_frame.parent.client = self.client
         self.username = None
+        self.user_id = None
+        clear_cached_thumbs()
 
-        self.notebook.forget(self.chat_widget)
-        self.chat_widget = self.chats_stub_frame
-        self.notebook.add(self.chat_widget, text="Chats")
+        chat_widget = self.chat_widget
+        gallery_widget = self.gallery_widget
+        if chat_widget is not None:
+            self._hide_tab(chat_widget, self.chats_stub_frame)
+            chat_widget.detach()
+        if gallery_widget is not None:
+            self._hide_tab(gallery_widget, self.gallery_stub_frame)
+            gallery_widget.detach()
 
-        self.notebook.forget(self.gallery_widget)
-        self.gallery_widget = self.gallery_stub_frame
-        self.notebook.add(self.gallery_widget, text="Gallery")
+        # After detach, so no queued download of the user writes into the folders anymore
+        if user_id is not None:
+            self.gallery_cache.drop_user(user_id)
+            self.chats_cache.drop_user(user_id)
 
 
 if __name__ == "__main__":
+    handler = RotatingFileHandler(LOG_FILE, maxBytes=LOG_MAX_BYTES, backupCount=1, encoding="utf-8")
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    handler.addFilter(RateLimitFilter())
+    # On the root logger, so the diagnostics of every module end up in the same file
+    logging.getLogger().addHandler(handler)
+    logging.getLogger().setLevel(logging.INFO)
     app = MainApplication()
     app.mainloop()
@@ -0,0 +1,69 @@
+import io
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chat_frame import ChatFrame
+
+
+def _png_bytes(size=(400, 300)):
+    buffer = io.BytesIO()
+    Image.new("RGB", size).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def _chat(data):
+    """
+    Stands in for a ChatFrame, the download worker only uses its client.
+    """
+    return SimpleNamespace(client=SimpleNamespace(download=lambda content: data))
+
+
+def test_fetch_bubble_image_caches_the_download(tmp_path):
+    path = str(tmp_path / "cat.png")
+
+    thumbnail = ChatFrame._fetch_bubble_image(_chat(_png_bytes()), "uploads/1/cat.png", path)
+
+    assert thumbnail.size == (300, 225)
+    assert sorted(os.listdir(tmp_path)) == [".thumbs", "cat.png"]
+
+
+def test_interrupted_write_leaves_no_cached_file(tmp_path, monkeypatch):
+    path = str(tmp_path / "cat.png")
+
+    def fail_midway(self, data):
+        with open(self, "wb") as f:
+            f.write(data[:10])
+        raise OSError("disk full")
+
+    monkeypatch.setattr(Path, "write_bytes", fail_midway)
+    with pytest.raises(OSError):
+        ChatFrame._fetch_bubble_image(_chat(_png_bytes()), "uploads/1/cat.png", path)
+
+    # Only the temporary file is left, the next attempt downloads again instead of reading a truncated image
+    assert not os.path.exists(path)
+
+
+def test_messages_reach_the_server_in_the_order_they_were_sent():
+    sent = []
+
+    def send_message(chat_id, message_type, content):
+        # The first message takes longest, it must still arrive first
+        time.sleep(0.05 if content == "first" else 0)
+        sent.append(content)
+
+    chat = SimpleNamespace(client=SimpleNamespace(send_message=send_message),
+                           _send_pool=ThreadPoolExecutor(max_workers=1))
+    for content in ("first", "second", "third"):
+        ChatFrame._send_message(chat, 1, "text", content)
+    chat._send_pool.shutdown(wait=True)
+
+    assert sent == ["first", "second", "third"]
@@ -0,0 +1,298 @@
+import os
+import socket
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import client
+from client import Client
+
+
+@pytest.fixture(autouse=True)
+def no_certificate(monkeypatch):
+    monkeypatch.setattr(client, "CRT_FILE", None)
+
+
+def _closed_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def test_creating_a_client_does_not_resolve_the_server(monkeypatch):
+    def fail(host, port):
+        raise socket.gaierror("Name or service not known")
+
+    monkeypatch.setattr(client, "resolve_server", fail)
+
+    c = Client("server.invalid", 443)
+    c.close()
+
+
+def test_server_is_resolved_once(monkeypatch):
+    port = _closed_port()
+    lookups = []
+
+    def resolve(host, port):
+        lookups.append(host)
+        return "127.0.0.1", port
+
+    monkeypatch.setattr(client, "resolve_server", resolve)
+    c = Client("localhost", port)
+    # Under the request lock like send_request, so the background connect has finished or waits
+    with c.request_lock:
+        for _ in range(2):
+            with pytest.raises(OSError):
+                c.connect()
+    c.close()
+
+    assert lookups == ["localhost"]
+
+
+@pytest.fixture
+def connection(monkeypatch):
+    """
+    A client connected to one end of a socket pair, the test plays the server on the other end.
+    """
+    ours, server = socket.socketpair()
+
+    def connect(self):
+        self.client_socket = ours
+        self.recv_buffer.clear()
+        self.connected = True
+        self.start_receiving()
+
+    monkeypatch.setattr(Client, "connect", connect)
+    c = Client("127.0.0.1", 443)
+    server.settimeout(5)
+    yield c, server
+    c.close()
+    server.close()
+
+
+def _read_requests(server, count):
+    """
+    Reads until the heads of count requests without body arrived.
+    """
+    data = b""
+    while data.count(b"\r\n\r\n") < count:
+        data += server.recv(65536)
+    return data
+
+
+def _response(body, status=200, headers=""):
+    return f"HTTP/1.1 {status} OK\r\n{headers}Content-Length: {len(body)}\r\n\r\n".encode() + body
+
+
+def _send_in_background(c, *requests):
+    """
+    Sends requests from threads of their own, in the given order.
+    :return: List the (status, body) results are stored in, and the threads
+    """
+    results = [None] * len(requests)
+    threads = []
+    for index, (method, path) in enumerate(requests):
+        def run(index=index, method=method, path=path):
+            status, body = c.send_request(method, path)
+            results[index] = (status, bytes(body))
+
+        thread = threading.Thread(target=run)
+        thread.start()
+        threads.append(thread)
+        # Wait until the request is queued, so the order of the pending futures is known
+        while len(c.pending_responses) < index + 1:
+            time.sleep(0.001)
+    return results, threads
+
+
+def _join(threads):
+    for thread in threads:
+        thread.join(5)
+        assert not thread.is_alive()
+
+
+def test_response_split_into_single_bytes(connection):
+    c, server = connection
+    results, threads = _send_in_background(c, ("GET", "/chats"))
+    _read_requests(server, 1)
+
+    for byte in _response(b'{"chats": []}'):
+        server.sendall(bytes([byte]))
+    _join(threads)
+
+    assert results == [(200, b'{"chats": []}')]
+
+
+def test_two_responses_in_one_read(connection):
+    c, server = connection
+    results, threads = _send_in_background(c, ("GET", "/a"), ("GET", "/b"))
+    _read_requests(server, 2)
+
+    server.sendall(_response(b"first") + _response(b"second", status=404))
+    _join(threads)
+
+    assert results == [(200, b"first"), (404, b"second")]
+
+
+def test_body_larger_than_the_receive_buffer(connection):
+    c, server = connection
+    body = os.urandom(client.RECV_BUFFER_SIZE * 3 + 17)
+    results, threads = _send_in_background(c, ("GET", "/download"), ("GET", "/chats"))
+    _read_requests(server, 2)
+
+    # The next response follows the large body directly, its bytes must not be taken into the body
+    server.sendall(_response(body) + _response(b"next"))
+    _join(threads)
+
+    assert results == [(200, body), (200, b"next")]
+
+
+def test_response_without_body(connection):
+    c, server = connection
+    results, threads = _send_in_background(c, ("GET", "/exit"))
+    _read_requests(server, 1)
+
+    server.sendall(_response(b""))
+    _join(threads)
+
+    assert results == [(200, b"")]
+
+
+def test_header_value():
+    headers = b"http/1.1 200 ok\r\ncontent-length:  12 \r\ntype: message"
+
+    assert Client._header_value(headers, b"content-length") == b"12"
+    assert Client._header_value(headers, b"type") == b"message"
+    assert Client._header_value(headers, b"length") is None
+
+
+def test_header_names_are_case_insensitive(connection):
+    c, server = connection
+    results, threads = _send_in_background(c, ("GET", "/chats"))
+    _read_requests(server, 1)
+
+    server.sendall(b"HTTP/1.1 200 OK\r\nX-Content-Length: 99\r\nCONTENT-LENGTH:5\r\n\r\nhello")
+    _join(threads)
+
+    assert results == [(200, b"hello")]
+
+
+def test_responses_resolve_requests_in_order(connection):
+    c, server = connection
+    paths = [f"/request{index}" for index in range(5)]
+    results, threads = _send_in_background(c, *[("GET", path) for path in paths])
+    _read_requests(server, len(paths))
+
+    server.sendall(b"".join(_response(path.encode()) for path in paths))
+    _join(threads)
+
+    assert results == [(200, path.encode()) for path in paths]
+
+
+def test_pending_requests_fail_when_the_connection_closes(connection):
+    c, server = connection
+    errors = []
+
+    def run():
+        try:
+            c.send_request("GET", "/chats")
+        except ConnectionError as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    _read_requests(server, 1)
+    server.shutdown(socket.SHUT_RDWR)
+    _join([thread])
+
+    assert len(errors) == 1
+    assert not c.connected
+
+
+def test_status_line_not_at_the_usual_offset(connection):
+    c, server = connection
+    results, threads = _send_in_background(c, ("GET", "/chats"))
+    _read_requests(server, 1)
+
+    server.sendall(b"HTTP/2 404 Not Found\r\nContent-Length: 4\r\n\r\nnope")
+    _join(threads)
+
+    assert results == [(404, b"nope")]
+
+
+def test_pushed_message_does_not_resolve_a_request(connection, monkeypatch, tmp_path):
+    monkeypatch.setattr(client, "CHAT_HISTORY_DIR", str(tmp_path))
+    c, server = connection
+    pushed = []
+    c.on_incoming_message = pushed.append
+    results, threads = _send_in_background(c, ("GET", "/chats"))
+    _read_requests(server, 1)
+
+    message = b'{"chat_id": 7, "sender": "bob", "content": "hi"}'
+    server.sendall(_response(message, headers="Type: message\r\n") + _response(b"chats"))
+    _join(threads)
+    c.history_queue.join()
+
+    assert results == [(200, b"chats")]
+    assert pushed == [{"chat_id": 7, "sender": "bob", "content": "hi"}]
+
+
+@pytest.fixture
+def offline(monkeypatch, tmp_path):
+    """
+    A client that never connects, with its chat history kept in a temporary folder.
+    """
+    monkeypatch.setattr(Client, "_connect_in_background", lambda self: None)
+    monkeypatch.setattr(client, "CHAT_HISTORY_DIR", str(tmp_path))
+    c = Client("127.0.0.1", 443)
+    yield c
+    c.history_queue.join()
+
+
+def _read_lines(path):
+    with open(path, "rb") as f:
+        return [client.json_loads(line) for line in f]
+
+
+def test_saved_messages_are_kept_in_memory(offline):
+    offline.save_message(3, {"content": "a"})
+    offline.save_message(3, {"content": "b"})
+
+    history = offline.load_chat_history(3)
+    history.append({"content": "changed by the caller"})
+
+    assert offline.load_chat_history("3") == [{"content": "a"}, {"content": "b"}]
+
+
+def test_messages_are_appended_as_json_lines(offline, tmp_path):
+    offline.save_message(3, {"content": "a"})
+    offline.save_message(4, {"content": "other chat"})
+    offline.save_message(3, {"content": "b"})
+    offline.history_queue.join()
+
+    assert _read_lines(tmp_path / "chat_3.jsonl") == [{"content": "a"}, {"content": "b"}]
+    assert _read_lines(tmp_path / "chat_4.jsonl") == [{"content": "other chat"}]
+
+
+def test_history_is_read_back_after_a_restart(offline):
+    offline.save_message(3, {"content": "a"})
+    offline.history_queue.join()
+
+    restarted = Client("127.0.0.1", 443)
+
+    assert restarted.load_chat_history(3) == [{"content": "a"}]
+
+
+def test_legacy_json_history_comes_first(offline, tmp_path):
+    with open(tmp_path / "chat_3.json", "w") as f:
+        f.write('[{"content": "old 1"}, {"content": "old 2"}]')
+    with open(tmp_path / "chat_3.jsonl", "w") as f:
+        f.write('{"content": "new 1"}\n\n')
+
+    offline.save_message(3, {"content": "new 2"})
+
+    assert [message["content"] for message in offline.load_chat_history(3)] == ["old 1", "old 2", "new 1", "new 2"]
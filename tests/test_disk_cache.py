@@ -0,0 +1,149 @@
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from disk_cache import DiskLRU
+
+
+def _write(path, size=10):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(b"x" * size)
+    return path
+
+
+def _wait_until_gone(path):
+    deadline = time.time() + 5
+    while os.path.exists(path) and time.time() < deadline:
+        time.sleep(0.01)
+
+
+def test_drop_user_only_removes_that_users_files(tmp_path):
+    cache = DiskLRU(str(tmp_path))
+    dropped = _write(os.path.join(cache.user_dir(1), "5", "cat.png"))
+    kept = _write(os.path.join(cache.user_dir(2), "5", "cat.png"))
+
+    cache.drop_user(1)
+
+    assert not os.path.exists(dropped)
+    assert os.path.exists(kept)
+    # The renamed folder is deleted in a background thread
+    for name in os.listdir(tmp_path):
+        if ".dropped" in name:
+            _wait_until_gone(os.path.join(str(tmp_path), name))
+    assert sorted(os.listdir(tmp_path)) == ["2"]
+
+
+def test_drop_user_without_cached_files(tmp_path):
+    cache = DiskLRU(str(tmp_path))
+
+    cache.drop_user(1)
+
+    assert os.listdir(tmp_path) == []
+
+
+def test_gc_removes_leftover_dropped_folders(tmp_path):
+    cache = DiskLRU(str(tmp_path))
+    _write(os.path.join(str(tmp_path), "1.dropped123", "cat.png"))
+    kept = _write(os.path.join(cache.user_dir(2), "cat.png"))
+
+    cache.gc()
+
+    assert sorted(os.listdir(tmp_path)) == ["2"]
+    assert os.path.exists(kept)
+
+
+def _set_atime(path, days_ago):
+    atime = time.time() - days_ago * 24 * 60 * 60
+    os.utime(path, (atime, os.stat(path).st_mtime))
+
+
+def test_gc_evicts_least_recently_used_until_under_the_size_cap(tmp_path):
+    cache = DiskLRU(str(tmp_path), max_bytes=25)
+    oldest = _write(os.path.join(str(tmp_path), "oldest"))
+    middle = _write(os.path.join(str(tmp_path), "middle"))
+    newest = _write(os.path.join(str(tmp_path), "newest"))
+    _set_atime(oldest, 3)
+    _set_atime(middle, 2)
+    _set_atime(newest, 1)
+
+    cache.gc()
+
+    assert not os.path.exists(oldest)
+    assert os.path.exists(middle)
+    assert os.path.exists(newest)
+
+
+def test_gc_evicts_files_older_than_the_age_limit(tmp_path):
+    cache = DiskLRU(str(tmp_path), max_age_days=7)
+    stale = _write(os.path.join(str(tmp_path), "stale"))
+    fresh = _write(os.path.join(str(tmp_path), "fresh"))
+    _set_atime(stale, 8)
+    _set_atime(fresh, 6)
+
+    cache.gc()
+
+    assert not os.path.exists(stale)
+    assert os.path.exists(fresh)
+
+
+def test_touch_marks_a_file_as_used_and_keeps_its_mtime(tmp_path):
+    cache = DiskLRU(str(tmp_path), max_bytes=15)
+    touched = _write(os.path.join(str(tmp_path), "touched"))
+    other = _write(os.path.join(str(tmp_path), "other"))
+    _set_atime(touched, 2)
+    _set_atime(other, 1)
+    mtime = os.stat(touched).st_mtime
+
+    DiskLRU.touch(touched)
+    cache.gc()
+
+    assert os.path.exists(touched)
+    assert not os.path.exists(other)
+    assert os.stat(touched).st_mtime == mtime
+
+
+def test_gc_walks_nested_folders(tmp_path):
+    cache = DiskLRU(str(tmp_path), max_bytes=10)
+    old = _write(os.path.join(cache.user_dir(1), "5", ".thumbs", "cat.png_150x150.png"))
+    new = _write(os.path.join(cache.user_dir(2), "cat.png"))
+    _set_atime(old, 2)
+    _set_atime(new, 1)
+
+    cache.gc()
+
+    assert not os.path.exists(old)
+    assert os.path.exists(new)
+
+
+def test_gc_does_not_follow_symlinked_folders(tmp_path):
+    outside = tmp_path / "outside"
+    kept = _write(str(outside / "keep.png"))
+    cache_root = tmp_path / "cache"
+    cache = DiskLRU(str(cache_root), max_bytes=0)
+    os.symlink(str(outside), str(cache_root / "link"))
+
+    cache.gc()
+
+    assert os.path.exists(kept)
+
+
+def test_gc_trims_to_the_file_count_cap(tmp_path):
+    cache = DiskLRU(str(tmp_path), max_files=2)
+    paths = [_write(os.path.join(str(tmp_path), f"file{index}")) for index in range(4)]
+    for days_ago, path in zip((4, 3, 2, 1), paths):
+        _set_atime(path, days_ago)
+
+    cache.gc()
+
+    assert [os.path.exists(path) for path in paths] == [False, False, True, True]
+
+
+def test_gc_of_an_empty_cache(tmp_path):
+    cache = DiskLRU(str(tmp_path / "cache"))
+
+    cache.gc()
+
+    assert os.listdir(tmp_path / "cache") == []
@@ -0,0 +1,153 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from editor import Editor, FILTER_BAND_ROWS
+from editor_frame import KERNELS, SEPARABLE_KERNELS
+
+
+def _editor(height, width, seed=0):
+    pixels = np.random.default_rng(seed).integers(0, 256, (height, width, 3), dtype=np.uint8)
+    editor = Editor()
+    editor.original_image = editor.current_image = Image.fromarray(pixels)
+    return editor, pixels
+
+
+def _reference(pixels, kernel):
+    """
+    Convolves pixel by pixel in float64, with reflect padding at the borders.
+    """
+    kernel = np.asarray(kernel, dtype=np.float64)[::-1, ::-1]
+    kh, kw = kernel.shape
+    padded = np.pad(pixels.astype(np.float64), ((kh // 2, kh // 2), (kw // 2, kw // 2), (0, 0)), mode="reflect")
+    result = np.empty(pixels.shape, dtype=np.float64)
+    for y in range(pixels.shape[0]):
+        for x in range(pixels.shape[1]):
+            window = padded[y:y + kh, x:x + kw]
+            result[y, x] = np.tensordot(window, kernel, axes=((0, 1), (0, 1)))
+    return np.clip(result, 0, 255).astype(np.uint8)
+
+
+def _assert_close(editor, expected):
+    # float32 arithmetic may truncate to the neighbouring integer
+    difference = np.abs(np.asarray(editor.current_image).astype(int) - expected.astype(int))
+    assert difference.max() <= 1
+
+
+@pytest.mark.parametrize("kernel", [
+    [[0, -1, 0], [-1, 5, -1], [0, -1, 0]],
+    [[-2, -1, 0], [-1, 1, 1], [0, 1, 2]],
+    [[-1, -1, -1], [-1, 8, -1], [-1, -1, -1]],
+    np.random.default_rng(1).uniform(-1, 1, (5, 5)),
+])
+def test_kernel_matches_the_reference(kernel):
+    editor, pixels = _editor(9, 11)
+
+    editor.apply_kernel(kernel)
+
+    _assert_close(editor, _reference(pixels, kernel))
+
+
+def test_asymmetric_kernel_is_flipped():
+    editor, pixels = _editor(8, 8)
+    kernel = [[0, 0, 0], [0, 0, 1], [0, 0, 0]]
+
+    editor.apply_kernel(kernel)
+
+    # Convolution takes each pixel from its left neighbour, the left border is reflected
+    result = np.asarray(editor.current_image)
+    assert np.array_equal(result[:, 1:], pixels[:, :-1])
+    assert np.array_equal(result[:, 0], pixels[:, 1])
+
+
+@pytest.mark.parametrize("kernel", [
+    np.outer([1, 2, 1], [1, 0, -1]),
+    np.outer([1, 4, 6, 4, 1], [1, 4, 6, 4, 1]) / 256,
+    np.outer([1, 2, 3], [3, 1, 2]) / 36,
+])
+def test_rank_one_kernel_matches_the_reference(kernel):
+    editor, pixels = _editor(10, 12)
+
+    editor.apply_kernel(kernel)
+
+    _assert_close(editor, _reference(pixels, kernel))
+
+
+def test_convolve_axis_matches_a_one_row_kernel():
+    editor, pixels = _editor(6, 9)
+    weights = np.array([0.25, 0.5, 0.25], dtype=np.float32)
+
+    rows = Editor.convolve_axis(pixels.astype(np.float32), weights, axis=1)
+    columns = Editor.convolve_axis(pixels.astype(np.float32), weights, axis=0)
+
+    assert np.allclose(rows, _reference_float(pixels, weights[None, ::-1]), atol=1e-3)
+    assert np.allclose(columns, _reference_float(pixels, weights[::-1, None]), atol=1e-3)
+
+
+def _reference_float(pixels, kernel):
+    """
+    Same as _reference, without clipping and rounding.
+    """
+    kernel = np.asarray(kernel, dtype=np.float64)[::-1, ::-1]
+    kh, kw = kernel.shape
+    padded = np.pad(pixels.astype(np.float64), ((kh // 2, kh // 2), (kw // 2, kw // 2), (0, 0)), mode="reflect")
+    h, w = pixels.shape[:2]
+    return sum(kernel[i, j] * padded[i:i + h, j:j + w] for i in range(kh) for j in range(kw))
+
+
+@pytest.mark.parametrize("name", ["Blur", "Box Blur (3x3)", "Gaussian Blur"])
+def test_separable_blur_matches_its_2d_kernel(name):
+    editor, pixels = _editor(13, 10)
+    row, col = SEPARABLE_KERNELS[name]
+
+    editor.apply_separable(row, col)
+
+    _assert_close(editor, _reference(pixels, KERNELS[name]))
+
+
+@pytest.mark.parametrize("height", [3, FILTER_BAND_ROWS - 1, FILTER_BAND_ROWS, FILTER_BAND_ROWS + 1,
+                                    2 * FILTER_BAND_ROWS + 5])
+def test_banded_convolution_at_band_boundaries(height):
+    kernel = KERNELS["Sharpness"]
+    editor, pixels = _editor(height, 7, seed=height)
+
+    editor.apply_kernel(kernel)
+
+    _assert_close(editor, _reference(pixels, kernel))
+
+
+def test_chained_filters_use_the_previous_result():
+    editor, _ = _editor(20, 9)
+
+    editor.apply_kernel(KERNELS["Emboss"])
+    embossed = np.asarray(editor.current_image).copy()
+    editor.apply_kernel(KERNELS["Sharpness"])
+
+    _assert_close(editor, _reference(embossed, KERNELS["Sharpness"]))
+    assert len(editor.undo_stack) == 2
+
+
+@pytest.mark.parametrize("kernel", [[[1]], [[0, 0, 0], [0, 1, 0], [0, 0, 0]], np.pad([[1.0]], 2)])
+def test_identity_kernel_leaves_the_image_alone(kernel):
+    editor, _ = _editor(5, 5)
+    image = editor.current_image
+
+    editor.apply_kernel(kernel)
+
+    assert editor.current_image is image
+    assert editor.undo_stack == []
+
+
+def test_kernel_with_only_the_centre_scaled_is_applied():
+    editor, pixels = _editor(5, 5)
+    kernel = [[0, 0, 0], [0, 0.5, 0], [0, 0, 0]]
+
+    editor.apply_kernel(kernel)
+
+    _assert_close(editor, _reference(pixels, kernel))
+    assert len(editor.undo_stack) == 1
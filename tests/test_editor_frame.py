@@ -0,0 +1,95 @@
+import os
+import sys
+from concurrent.futures import Future
+from types import SimpleNamespace
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import editor_frame
+from editor_frame import EditorFrame, KERNELS, FLIPPED_KERNELS, SEPARABLE_KERNELS
+
+
+def _frame(upload_result=None):
+    """
+    Stands in for an EditorFrame, the upload code only uses these attributes.
+    """
+    invalidated = []
+    uploads = []
+
+    def upload(filename, data):
+        uploads.append((filename, bytes(data)))
+        return upload_result
+
+    parent = SimpleNamespace(client=SimpleNamespace(upload=upload), invalidate=invalidated.append)
+    return SimpleNamespace(parent=parent, winfo_exists=lambda: True, invalidated=invalidated, uploads=uploads)
+
+
+def _finished(result=None, error=None):
+    future = Future()
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
+    return future
+
+
+def _record_messages(monkeypatch):
+    shown = []
+    monkeypatch.setattr(editor_frame.messagebox, "showinfo", lambda *args: shown.append(("info",) + args))
+    monkeypatch.setattr(editor_frame.messagebox, "showerror", lambda *args: shown.append(("error",) + args))
+    return shown
+
+
+def test_encode_and_upload_returns_the_server_path():
+    frame = _frame("uploads/1/cat.png")
+
+    result = EditorFrame._encode_and_upload(frame, Image.new("RGB", (4, 4)), "cat.png")
+
+    assert result == "uploads/1/cat.png"
+    assert frame.uploads[0][0] == "cat.png"
+    assert frame.uploads[0][1].startswith(b"\x89PNG")
+
+
+def test_successful_upload_refreshes_the_gallery(monkeypatch):
+    shown = _record_messages(monkeypatch)
+    frame = _frame()
+
+    EditorFrame._on_upload_done(frame, _finished("uploads/1/cat.png"))
+
+    assert frame.invalidated == ["Gallery"]
+    assert shown[0][0] == "info"
+
+
+def test_rejected_upload_is_reported_as_an_error(monkeypatch):
+    shown = _record_messages(monkeypatch)
+    frame = _frame()
+
+    EditorFrame._on_upload_done(frame, _finished(None))
+
+    assert frame.invalidated == []
+    assert shown[0][0] == "error"
+
+
+def test_failed_upload_is_reported_as_an_error(monkeypatch):
+    shown = _record_messages(monkeypatch)
+    frame = _frame()
+
+    EditorFrame._on_upload_done(frame, _finished(error=ConnectionError("Connection to the server closed")))
+
+    assert frame.invalidated == []
+    assert shown[0][0] == "error"
+
+
+def test_kernels_are_contiguous_float32():
+    for name, kernel in KERNELS.items():
+        assert kernel.dtype == np.float32, name
+        assert kernel.flags.c_contiguous, name
+        assert np.array_equal(FLIPPED_KERNELS[name], kernel[::-1, ::-1]), name
+
+
+def test_separable_kernels_match_their_2d_kernel():
+    for name, (row, col) in SEPARABLE_KERNELS.items():
+        assert np.allclose(np.outer(col, row), KERNELS[name]), name
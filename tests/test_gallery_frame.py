@@ -0,0 +1,67 @@
+import io
+import os
+import sys
+from types import SimpleNamespace
+
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from gallery_frame import GalleryFrame
+
+
+def _png_bytes(size=(300, 200)):
+    buffer = io.BytesIO()
+    Image.new("RGB", size).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def _gallery(cache_dir, generation=1):
+    """
+    Stands in for a GalleryFrame, the pool workers only use these attributes.
+    """
+    downloads = []
+
+    def download(path):
+        downloads.append(path)
+        return _png_bytes()
+
+    gallery = SimpleNamespace(cache_dir=cache_dir, thumbnail_size=(150, 150), _gallery_generation=generation,
+                              client=SimpleNamespace(download=download), downloads=downloads)
+    gallery.download_and_cache = lambda *args: GalleryFrame.download_and_cache(gallery, *args)
+    return gallery
+
+
+def test_job_writes_into_the_folder_it_was_submitted_for(tmp_path):
+    user_a, user_b = str(tmp_path / "a"), str(tmp_path / "b")
+    os.makedirs(user_a)
+    os.makedirs(user_b)
+    gallery = _gallery(user_a)
+
+    # User A logged out and user B logged in before the queued job ran
+    gallery.cache_dir = user_b
+    cached_path, image = GalleryFrame._prepare_thumbnail(gallery, "uploads/1/cat.png", "cat.png", user_a, 1)
+
+    assert cached_path == os.path.join(user_a, "cat.png")
+    assert os.listdir(user_b) == []
+
+
+def test_stale_job_does_nothing(tmp_path):
+    gallery = _gallery(str(tmp_path), generation=2)
+
+    result = GalleryFrame._prepare_thumbnail(gallery, "uploads/1/cat.png", "cat.png", str(tmp_path), 1)
+
+    assert result == (None, None)
+    assert gallery.downloads == []
+    assert os.listdir(tmp_path) == []
+
+
+def test_download_is_cached(tmp_path):
+    gallery = _gallery(str(tmp_path))
+
+    first = GalleryFrame.download_and_cache(gallery, "uploads/1/cat.png", "cat.png")
+    second = GalleryFrame.download_and_cache(gallery, "uploads/1/cat.png", "cat.png")
+
+    assert first == second == os.path.join(str(tmp_path), "cat.png")
+    assert gallery.downloads == ["uploads/1/cat.png"]
+    assert not [name for name in os.listdir(tmp_path) if ".part" in name]
@@ -0,0 +1,41 @@
+import os
+import sys
+
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from gallery_frame import load_thumbnail, _thumbnail_is_fresh
+
+
+def _make_image(tmp_path, name, size, mode="RGB"):
+    path = str(tmp_path / name)
+    Image.new(mode, size).save(path)
+    return path
+
+
+def test_image_smaller_than_thumbnail_size(tmp_path):
+    path = _make_image(tmp_path, "small.png", (100, 80))
+
+    thumbnail = load_thumbnail(path, (150, 150))
+
+    assert thumbnail.size == (100, 80)
+    assert _thumbnail_is_fresh(path, (150, 150))
+
+
+def test_image_larger_than_thumbnail_size(tmp_path):
+    path = _make_image(tmp_path, "large.png", (1000, 800))
+
+    thumbnail = load_thumbnail(path, (150, 150))
+
+    assert thumbnail.size == (150, 120)
+    assert _thumbnail_is_fresh(path, (150, 150))
+
+
+def test_small_palette_image(tmp_path):
+    path = _make_image(tmp_path, "palette.png", (40, 30), mode="P")
+
+    thumbnail = load_thumbnail(path, (150, 150))
+
+    assert thumbnail.size == (40, 30)
+    assert thumbnail.mode == "RGBA"